@@ -0,0 +1,137 @@
+"""
+音频节奏分析缓存
+
+以音频文件内容哈希和分析参数为键，把节拍、onset、速度等分析结果持久化到磁盘，
+重复渲染同一首歌时可以完全跳过音频解码和节奏分析。同一首歌不同参数的结果分别保存，
+交替使用多组参数时都能命中缓存，不再使用的条目由大小上限按最近使用时间淘汰。
+"""
+
+import os
+import hashlib
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from cache_utils import evict_lru
+
+logger = logging.getLogger(__name__)
+
+# 分析算法或缓存格式变化时递增，旧缓存会被自动视为失效
+CACHE_VERSION = 2
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    计算文件内容的 SHA-256 哈希
+
+    Args:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        十六进制哈希字符串
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化分析缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节），超出后按最近使用时间淘汰
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # (路径, 大小, 修改时间) -> 内容哈希，避免同一进程内重复计算哈希
+        self._hash_memo: Dict[Tuple[str, int, float], str] = {}
+
+    def content_key(self, audio_path: str) -> str:
+        """
+        获取音频文件的内容哈希
+
+        Args:
+            audio_path: 音频文件路径
+
+        Returns:
+            内容哈希
+        """
+        stat = os.stat(audio_path)
+        memo_key = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime)
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = hash_file(audio_path)
+        return self._hash_memo[memo_key]
+
+    def _entry_path(self, audio_path: str, params: Dict) -> str:
+        params_key = hashlib.sha256(self._params_signature(params).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self.content_key(audio_path)}-{params_key}.npz")
+
+    @staticmethod
+    def _params_signature(params: Dict) -> str:
+        items = sorted(params.items())
+        return ";".join(f"{k}={v}" for k, v in [("version", CACHE_VERSION)] + items)
+
+    def load(self, audio_path: str, params: Dict) -> Optional[Dict[str, np.ndarray]]:
+        """
+        读取缓存的分析结果
+
+        Args:
+            audio_path: 音频文件路径
+            params: 分析参数（如 hop_length、sr），不同参数的结果分别缓存
+
+        Returns:
+            分析结果数组字典，未命中时返回 None
+        """
+        entry_path = self._entry_path(audio_path, params)
+        if not os.path.exists(entry_path):
+            return None
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as data:
+                if str(data['params']) != self._params_signature(params):
+                    # 参数哈希冲突，视为未命中，旧条目留给淘汰策略处理
+                    logger.info("节奏分析缓存的参数不一致，重新分析")
+                    return None
+                result = {name: data[name] for name in data.files if name != 'params'}
+        except Exception as e:
+            logger.warning(f"读取节奏分析缓存时出错: {e}")
+            return None
+
+        # 更新访问时间，供淘汰策略使用；其他任务可能刚好淘汰了该条目，结果已经读入内存，不影响本次使用
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return result
+
+    def store(self, audio_path: str, params: Dict, **arrays: np.ndarray) -> None:
+        """
+        写入分析结果
+
+        Args:
+            audio_path: 音频文件路径
+            params: 分析参数
+            **arrays: 需要缓存的结果数组
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_path = self._entry_path(audio_path, params)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, params=np.array(self._params_signature(params)), **arrays)
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"写入节奏分析缓存时出错: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        evict_lru(self.cache_dir, '.npz', self.max_bytes, keep={entry_path}, label="节奏分析缓存")
@@ -0,0 +1,123 @@
+"""
+流式音频分析
+
+长音频（如一小时的DJ混音）不一次性载入整条波形，而是用 librosa.stream
+按重叠的块读取，逐块计算 onset 强度包络，峰值内存只取决于块大小。
+"""
+
+import logging
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 超过该时长（秒）的音频默认使用流式分析
+STREAMING_MIN_DURATION = 600.0
+
+# 每块包含的分析帧数
+STREAM_BLOCK_FRAMES = 256
+
+# 与 librosa.onset.onset_strength 默认一致的梅尔频带数和 FFT 窗长（以 22050Hz 计）
+N_MELS = 128
+N_FFT = 2048
+
+
+def should_stream(audio_path: str) -> bool:
+    """
+    判断音频是否足够长、需要使用流式分析
+
+    Args:
+        audio_path: 音频文件路径
+
+    Returns:
+        是否使用流式分析
+    """
+    # 缓存命中时也要先判断时长（是否流式是缓存键的一部分），soundfile 只读文件头，
+    # 不必导入 librosa；soundfile 不支持的格式再交给 librosa（audioread）
+    import soundfile
+    try:
+        return soundfile.info(audio_path).duration >= STREAMING_MIN_DURATION
+    except RuntimeError:
+        pass
+    try:
+        import librosa
+        return librosa.get_duration(path=audio_path) >= STREAMING_MIN_DURATION
+    except Exception as e:
+        logger.warning(f"读取音频时长时出错: {e}")
+        return False
+
+
+def stream_onset_envelope(audio_path: str, hop_length: int = 512,
+                          sr: int = 22050) -> Tuple[np.ndarray, int, int]:
+    """
+    按块流式计算 onset 强度包络
+
+    音频按原始采样率读取，hop_length 和 FFT 窗长按采样率比例换算，
+    使分析的时间分辨率与 sr 下的 hop_length 相同。
+
+    Args:
+        audio_path: 音频文件路径
+        hop_length: 分析步长（以 sr 为采样率计）
+        sr: 参考采样率
+
+    Returns:
+        (onset 强度包络, 实际采样率, 实际步长)
+    """
+    import librosa
+    import soundfile
+    native_sr = librosa.get_samplerate(audio_path)
+    scale = native_sr / sr
+    hop = max(1, int(round(hop_length * scale)))
+    n_fft = int(2 ** np.ceil(np.log2(N_FFT * scale)))
+
+    mel_basis = librosa.filters.mel(sr=native_sr, n_fft=n_fft, n_mels=N_MELS)
+    stream = librosa.stream(audio_path, block_length=STREAM_BLOCK_FRAMES, frame_length=n_fft,
+                            hop_length=hop, mono=True, fill_value=0)
+
+    # 流式读取使用不居中的帧：不居中的第 m 帧相当于居中的第 m + n_fft/(2·hop) 帧，
+    # onset_strength 又把差分结果右移 1 + n_fft // (2·hop) 帧，两者合计为开头补齐的帧数
+    lead = 1 + n_fft // (2 * hop) + int(round(n_fft / (2 * hop)))
+    envelope_blocks = [np.zeros(lead, dtype=np.float32)]
+    previous = None
+
+    for y_block in stream:
+        power = np.abs(librosa.stft(y_block, n_fft=n_fft, hop_length=hop, center=False)) ** 2
+        mel_db = librosa.power_to_db(mel_basis @ power, ref=1.0, top_db=None)
+
+        # 跨块差分需要上一块的最后一帧
+        if previous is not None:
+            mel_db_with_prev = np.concatenate([previous, mel_db], axis=1)
+        else:
+            mel_db_with_prev = mel_db
+        previous = mel_db[:, -1:]
+
+        flux = np.maximum(0.0, np.diff(mel_db_with_prev, axis=1)).mean(axis=0)
+        envelope_blocks.append(flux.astype(np.float32))
+
+    # 最后一块按 fill_value 补齐到整块，截掉音频结束之后的帧，帧数与 librosa 的居中帧相同
+    n_frames = 1 + soundfile.info(audio_path).frames // hop
+    envelope = np.concatenate(envelope_blocks)[:n_frames]
+    envelope = np.pad(envelope, (0, n_frames - len(envelope)))
+    return envelope, native_sr, hop
+
+
+def envelope_lag(reference: np.ndarray, envelope: np.ndarray, max_lag: int = 8) -> int:
+    """
+    两个 onset 包络之间互相关最大的帧偏移，0 表示两者对齐
+
+    Args:
+        reference: 参考包络（librosa.onset.onset_strength 的结果）
+        envelope: 待检查的包络
+        max_lag: 搜索的最大偏移帧数
+
+    Returns:
+        envelope 相对 reference 的偏移帧数，负数表示 envelope 偏早
+    """
+    n = min(len(reference), len(envelope)) - 2 * max_lag
+    if n <= 0:
+        raise ValueError("包络太短，无法比较")
+    reference = np.asarray(reference[max_lag:max_lag + n], dtype=np.float64)
+    scores = [float(np.dot(reference, np.asarray(envelope[max_lag + lag:max_lag + lag + n], dtype=np.float64)))
+              for lag in range(-max_lag, max_lag + 1)]
+    return int(np.argmax(scores)) - max_lag
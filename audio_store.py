@@ -0,0 +1,184 @@
+"""
+解码音频共享缓存
+
+把解码后的 PCM 和 onset 强度包络保存为 .npy 文件，之后以内存映射方式读取：
+节奏分析、MoviePy 导出以及批量任务和服务模式中的各个工作进程共用同一份文件，
+多个进程映射同一文件时共享操作系统的页缓存，每个音频只需解码一次。
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+from typing import Callable
+
+import numpy as np
+
+from cache_utils import evict_lru
+
+logger = logging.getLogger(__name__)
+
+# 解码方式或文件格式变化时递增，使旧的缓存文件失效
+AUDIO_STORE_VERSION = 1
+
+# 导出时使用的采样率和声道数，与 MoviePy 的 AudioFileClip 默认值一致
+RENDER_SAMPLE_RATE = 44100
+RENDER_CHANNELS = 2
+
+# 从 ffmpeg 读取解码数据的块大小（字节）
+DECODE_CHUNK_BYTES = 1 << 20
+
+
+class DecodedAudioStore:
+    def __init__(self, cache_dir: str, max_bytes: int = 4 * 1024 ** 3):
+        """
+        初始化解码音频缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限，超出时删除最久未使用的文件
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, audio_path: str, name: str) -> str:
+        """缓存文件路径，源文件按路径、大小和修改时间识别，文件被替换后缓存自然失效"""
+        import hashlib
+
+        stat = os.stat(audio_path)
+        source = f"v={AUDIO_STORE_VERSION}|{os.path.abspath(audio_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}-{name}.npy")
+
+    def _load_or_build(self, path: str, build: Callable[[str], None], mmap: bool = True) -> np.ndarray:
+        """
+        读取缓存文件，不存在时调用 build 写入临时文件后再重命名
+
+        Args:
+            path: 缓存文件路径
+            build: 把数组写入指定路径的函数
+            mmap: 是否以只读内存映射方式读取
+
+        Returns:
+            缓存的数组
+        """
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # 先写入临时文件再重命名，避免并发的工作进程读到未写完的文件
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                build(tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            evict_lru(self.cache_dir, ".npy", self.max_bytes, keep={path}, label="解码音频缓存")
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+    def analysis_pcm(self, audio_path: str, sr: int = 22050) -> np.ndarray:
+        """
+        节奏分析用的单声道 PCM（float32，与 librosa.load 的结果相同）
+
+        Args:
+            audio_path: 音频文件路径
+            sr: 采样率
+
+        Returns:
+            只读内存映射数组，形状为 (采样数,)
+        """
+        def build(path: str) -> None:
+            import librosa
+            logger.info("正在解码音频（分析用）...")
+            y, _ = librosa.load(audio_path, sr=sr)
+            with open(path, "wb") as f:
+                np.save(f, y.astype(np.float32, copy=False))
+
+        return self._load_or_build(self._path(audio_path, f"pcm-mono-{sr}"), build)
+
+    def onset_envelope(self, audio_path: str, sr: int = 22050, hop_length: int = 512,
+                       aggregate: str = "mean") -> np.ndarray:
+        """
+        onset 强度包络
+
+        librosa 的节拍跟踪使用按频带中位数聚合的包络，onset 检测使用平均值聚合的包络，
+        两者分别缓存，结果与直接传入波形时相同。
+
+        Args:
+            audio_path: 音频文件路径
+            sr: 采样率
+            hop_length: 分析步长
+            aggregate: 频带聚合方式，"mean" 或 "median"
+
+        Returns:
+            onset 强度包络
+        """
+        if aggregate not in ("mean", "median"):
+            raise ValueError(f"未知的聚合方式: {aggregate}")
+
+        def build(path: str) -> None:
+            import librosa
+            y = self.analysis_pcm(audio_path, sr)
+            envelope = librosa.onset.onset_strength(y=np.asarray(y), sr=sr, hop_length=hop_length,
+                                                    aggregate=np.median if aggregate == "median" else np.mean)
+            with open(path, "wb") as f:
+                np.save(f, envelope)
+
+        # 包络很小，直接读入内存（librosa 的部分函数会原地修改传入的数组）
+        return self._load_or_build(self._path(audio_path, f"onset-{aggregate}-{sr}-{hop_length}"),
+                                   build, mmap=False)
+
+    def render_pcm(self, audio_path: str, fps: int = RENDER_SAMPLE_RATE) -> np.ndarray:
+        """
+        导出用的立体声 PCM，由 ffmpeg 流式解码写入磁盘，内存占用与音频长度无关
+
+        Args:
+            audio_path: 音频文件路径
+            fps: 采样率
+
+        Returns:
+            只读内存映射数组，形状为 (采样数, 2)
+        """
+        def build(path: str) -> None:
+            from ffmpeg_render import get_ffmpeg_binary
+
+            logger.info("正在解码音频（导出用）...")
+            raw_path = f"{path}.raw"
+            command = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", audio_path,
+                       "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(RENDER_CHANNELS),
+                       "-ar", str(fps), "-"]
+            try:
+                with open(raw_path, "wb") as raw:
+                    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    shutil.copyfileobj(process.stdout, raw, DECODE_CHUNK_BYTES)
+                    _, stderr = process.communicate()
+                if process.returncode != 0:
+                    raise RuntimeError(f"ffmpeg 解码音频失败: {stderr.decode('utf-8', 'replace').strip()}")
+
+                frame_bytes = 4 * RENDER_CHANNELS
+                samples = os.path.getsize(raw_path) // frame_bytes
+                header = {"descr": "<f4", "fortran_order": False, "shape": (samples, RENDER_CHANNELS)}
+                with open(path, "wb") as f, open(raw_path, "rb") as raw:
+                    np.lib.format.write_array_header_1_0(f, header)
+                    shutil.copyfileobj(raw, f, DECODE_CHUNK_BYTES)
+                    f.truncate(f.tell() - os.path.getsize(raw_path) + samples * frame_bytes)
+            finally:
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+
+        return self._load_or_build(self._path(audio_path, f"pcm-stereo-{fps}"), build)
+
+    def audio_clip(self, audio_path: str, fps: int = RENDER_SAMPLE_RATE):
+        """
+        以缓存的 PCM 创建 MoviePy 音频片段，代替 AudioFileClip 重新解码
+
+        Args:
+            audio_path: 音频文件路径
+            fps: 采样率
+
+        Returns:
+            AudioArrayClip
+        """
+        from moviepy.audio.AudioClip import AudioArrayClip
+        return AudioArrayClip(self.render_pcm(audio_path, fps), fps=fps)
@@ -0,0 +1,138 @@
+"""
+批量渲染
+
+一次运行中用同一个视频素材库为多首歌曲生成节奏视频：
+素材库只扫描、评分一次，然后把各个任务分发到多个工作进程并行渲染。
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional
+
+from rhythm_video_editor import RhythmVideoEditor, DEFAULT_CACHE_DIR
+from render_profile import DEFAULT_RENDER_PROFILE
+from video_index import VideoInfo
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob(NamedTuple):
+    """单个批量任务"""
+    audio: str
+    output: str
+    segment_duration: float = 1.0
+
+
+class JobResult(NamedTuple):
+    """单个批量任务的执行结果"""
+    job: BatchJob
+    success: bool
+    seconds: float
+    error: str = ""
+
+
+def load_manifest(manifest_path: str) -> List[BatchJob]:
+    """
+    读取任务清单
+
+    清单是 JSON 文件，可以是任务列表，也可以是 {"jobs": [...]}；
+    每个任务包含 audio、output，以及可选的 segment_duration。
+
+    Args:
+        manifest_path: 清单文件路径
+
+    Returns:
+        任务列表
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = data.get("jobs", [])
+
+    jobs = []
+    for i, item in enumerate(data):
+        if "audio" not in item or "output" not in item:
+            raise ValueError(f"任务清单第 {i + 1} 项缺少 audio 或 output")
+        jobs.append(BatchJob(item["audio"], item["output"],
+                             float(item.get("segment_duration", 1.0))))
+    return jobs
+
+
+def _run_job(job: BatchJob, video_dir: str, video_info: Optional[Dict[str, VideoInfo]],
+             cache_dir: Optional[str], engine: str, render_profile: str) -> JobResult:
+    """
+    在工作进程中执行单个任务
+
+    有缓存目录时直接从主进程已更新的素材索引读取视频信息；没有缓存目录时
+    使用主进程传入的视频信息（没有持久化索引时，已有的视频信息不会重新分析）
+    """
+    start = time.perf_counter()
+    try:
+        output_dir = os.path.dirname(job.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        editor = RhythmVideoEditor(job.audio, video_dir, job.output, cache_dir=cache_dir,
+                                   render_profile=render_profile)
+        if video_info is not None:
+            editor.video_info = dict(video_info)
+        editor.create_rhythm_video(segment_duration=job.segment_duration, engine=engine)
+        return JobResult(job, True, time.perf_counter() - start)
+    except Exception as e:
+        logger.error(f"任务 {job.audio} 失败: {e}")
+        return JobResult(job, False, time.perf_counter() - start, str(e))
+
+
+def run_batch(jobs: List[BatchJob], video_dir: str, concurrency: int = 2, workers: int = 0,
+              cache_dir: Optional[str] = DEFAULT_CACHE_DIR, engine: str = "moviepy",
+              render_profile: str = DEFAULT_RENDER_PROFILE) -> List[JobResult]:
+    """
+    批量渲染
+
+    Args:
+        jobs: 任务列表
+        video_dir: 视频文件目录
+        concurrency: 同时执行的任务数
+        workers: 分析视频素材的并行进程数，小于等于0时使用全部CPU核心
+        cache_dir: 缓存目录
+        engine: 渲染引擎
+        render_profile: 编码预设名称
+
+    Returns:
+        与 jobs 顺序一致的执行结果
+    """
+    if not jobs:
+        return []
+
+    # 只扫描、评分一次素材库
+    logger.info("正在加载视频素材索引...")
+    library = RhythmVideoEditor(jobs[0].audio, video_dir, "", cache_dir=cache_dir, workers=workers)
+    if not library.load_video_files():
+        raise ValueError("没有找到视频文件")
+    # 有索引时工作进程自己读取，不必把整个素材库（包括动态曲线）序列化到每个任务
+    video_info = library.video_info if cache_dir is None else None
+
+    results: Dict[int, JobResult] = {}
+    logger.info(f"开始批量渲染 {len(jobs)} 个任务，并发数 {concurrency}")
+    with ProcessPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(_run_job, job, video_dir, video_info, cache_dir, engine,
+                            render_profile): i
+            for i, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                results[i] = JobResult(jobs[i], False, 0.0, str(e))
+            result = results[i]
+            status = "完成" if result.success else "失败"
+            logger.info(f"任务 {os.path.basename(result.job.audio)} {status}，耗时 {result.seconds:.1f} 秒")
+
+    return [results[i] for i in range(len(jobs))]
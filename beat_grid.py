@@ -0,0 +1,131 @@
+"""
+节奏点网格
+
+用 NumPy 数组保存合并、去重、按最小间隔过滤后的节奏点，
+并预先计算相邻节奏点之间的时长，供渲染循环直接使用。
+"""
+
+from typing import Callable, Iterator, Optional, Union
+
+import numpy as np
+
+
+def min_gap_filter(times: np.ndarray, min_gap: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    过滤过于密集的时间点：从第一个点开始，只保留与上一个保留点间隔不小于 min_gap 的点
+
+    逐点比较本质上是串行的，这里先用 searchsorted 算出每个点之后第一个满足间隔的点，
+    再用倍增跳转一次性展开从第一个点出发的整条跳转链，全程只有 O(log n) 次数组运算。
+
+    Args:
+        times: 已排序的时间点
+        min_gap: 最小间隔（秒），可以是标量，也可以是与 times 等长的数组（每个点自己的间隔）
+
+    Returns:
+        过滤后的时间点
+    """
+    times = np.asarray(times, dtype=np.float64)
+    n = len(times)
+    if n == 0:
+        return times
+
+    gaps = np.broadcast_to(np.asarray(min_gap, dtype=np.float64), times.shape)
+    # jump[i]: 保留第 i 个点后，下一个会被保留的点；n 为哨兵，表示没有后续点
+    jump = np.append(np.searchsorted(times, times + gaps, side='left'), n)
+
+    levels = [jump]
+    for _ in range(int(np.ceil(np.log2(n + 1)))):
+        levels.append(levels[-1][levels[-1]])
+
+    # 从高到低依次加入跳 2^k 步能到达的点，最终得到跳 0..2^(k+1)-1 步能到达的全部点
+    keep = np.zeros(n + 1, dtype=bool)
+    keep[0] = True
+    for level in reversed(levels):
+        keep[level[np.flatnonzero(keep)]] = True
+
+    return times[keep[:n]]
+
+
+class BeatGrid:
+    def __init__(self, times: np.ndarray, downbeats: Optional[np.ndarray] = None):
+        """
+        初始化节奏点网格
+
+        Args:
+            times: 已排序的节奏点时间（秒）
+            downbeats: 小节起点时间（秒），动态速度模式下才有
+        """
+        self.times = np.asarray(times, dtype=np.float64)
+        self.downbeats = np.asarray(downbeats, dtype=np.float64) if downbeats is not None else None
+        # 相邻节奏点之间的时长
+        self.intervals = np.diff(self.times)
+
+    @classmethod
+    def from_events(cls, *event_times: np.ndarray,
+                    min_gap: Union[float, Callable[[np.ndarray], np.ndarray]] = 0.3,
+                    downbeats: Optional[np.ndarray] = None) -> "BeatGrid":
+        """
+        合并多组事件时间（如节拍和onset），去重排序后按最小间隔过滤
+
+        Args:
+            *event_times: 多组事件时间
+            min_gap: 最小间隔（秒），也可以是根据合并后的时间点返回每个点间隔的函数
+            downbeats: 小节起点时间
+
+        Returns:
+            节奏点网格
+        """
+        arrays = [np.asarray(times, dtype=np.float64) for times in event_times]
+        all_times = np.unique(np.concatenate(arrays)) if arrays else np.zeros(0)
+        gaps = min_gap(all_times) if callable(min_gap) else min_gap
+        return cls(min_gap_filter(all_times, gaps), downbeats)
+
+    def target_durations(self, tail_duration: float) -> np.ndarray:
+        """
+        每个节奏点对应片段的目标时长
+
+        Args:
+            tail_duration: 最后一个节奏点（没有下一个节奏点）的片段时长
+
+        Returns:
+            与节奏点等长的时长数组
+        """
+        if len(self.times) == 0:
+            return np.zeros(0)
+        return np.append(self.intervals, tail_duration)
+
+    def segment_energy(self, envelope: np.ndarray, frame_period: float, tail_duration: float) -> np.ndarray:
+        """
+        每个节奏点对应片段内 onset 强度包络的平均值
+
+        Args:
+            envelope: onset 强度包络
+            frame_period: 包络每帧的时长（秒）
+            tail_duration: 最后一个节奏点的片段时长
+
+        Returns:
+            与节奏点等长的能量数组
+        """
+        envelope = np.asarray(envelope, dtype=np.float64)
+        if len(self.times) == 0 or len(envelope) == 0:
+            return np.zeros(len(self.times))
+        cumulative = np.concatenate([[0.0], np.cumsum(envelope)])
+        starts = np.clip(np.round(self.times / frame_period).astype(int), 0, len(envelope) - 1)
+        ends = np.round((self.times + self.target_durations(tail_duration)) / frame_period).astype(int)
+        ends = np.clip(ends, starts + 1, len(envelope))
+        return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.times)
+
+    def __array__(self, dtype=None):
+        return self.times if dtype is None else self.times.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"BeatGrid({len(self.times)} beats)"
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+节奏视频剪辑器基准测试
+
+离线生成合成素材（已知 BPM 的节拍器音频、运动量可控的程序生成视频），
+在不同规模下测量音频分析、素材评分、片段规划和渲染的耗时，
+以及 run.py 轻量命令的启动时间，并与保存的基线比较，发现性能回退。
+
+用法:
+    python benchmark.py --scale small                 # 运行并与基线比较
+    python benchmark.py --scale small medium --save-baseline
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+BENCHMARK_DIR = "benchmarks"
+DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# run.py --list / --check 的启动时间上限（秒），与基线无关，超出即视为回退
+STARTUP_BUDGET = 1.0
+
+# 渲染时单个子进程（ffmpeg）的峰值内存上限（MB），与基线无关，超出即视为回退
+RENDER_MEMORY_BUDGET_MB = 1024.0
+
+# 合成素材的参数
+AUDIO_SAMPLE_RATE = 22050
+VIDEO_SIZE = (160, 120)
+VIDEO_FPS = 25.0
+
+
+class BenchmarkScale(NamedTuple):
+    """基准测试规模"""
+    name: str
+    clips: int
+    audio_seconds: float
+    bpm: float = 120.0
+    render: bool = True
+    video_size: Tuple[int, int] = VIDEO_SIZE
+
+
+SCALES = {
+    "small": BenchmarkScale("small", clips=10, audio_seconds=30),
+    "medium": BenchmarkScale("medium", clips=100, audio_seconds=300, bpm=128.0),
+    # 与 medium 相同但素材为 1080p，检查渲染内存不随片段数增长
+    "medium-hd": BenchmarkScale("medium-hd", clips=100, audio_seconds=300, bpm=128.0, video_size=(1920, 1080)),
+    # 60 分钟音轨的完整渲染耗时很长，默认只测分析和规划
+    "large": BenchmarkScale("large", clips=1000, audio_seconds=3600, bpm=100.0, render=False),
+}
+
+
+def generate_click_track(path: str, seconds: float, bpm: float,
+                         sr: int = AUDIO_SAMPLE_RATE, seed: int = 0) -> None:
+    """
+    生成节拍器音频：每拍一个衰减的正弦脉冲，每小节第一拍加重，并叠加少量噪声
+
+    Args:
+        path: 输出 WAV 文件路径
+        seconds: 时长（秒）
+        bpm: 每分钟拍数
+        sr: 采样率
+        seed: 噪声的随机种子
+    """
+    from scipy.io import wavfile
+
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0.0, 0.01, int(seconds * sr)).astype(np.float32)
+
+    click_length = int(0.05 * sr)
+    t = np.arange(click_length) / sr
+    envelope = np.exp(-t * 60.0)
+    click = (np.sin(2 * np.pi * 1000.0 * t) * envelope).astype(np.float32)
+    accent = (np.sin(2 * np.pi * 1500.0 * t) * envelope).astype(np.float32)
+
+    beat_interval = 60.0 / bpm
+    for i, beat_time in enumerate(np.arange(0.0, seconds, beat_interval)):
+        start = int(beat_time * sr)
+        end = min(start + click_length, len(audio))
+        audio[start:end] += (accent if i % 4 == 0 else click * 0.6)[:end - start]
+
+    audio = np.clip(audio, -1.0, 1.0)
+    wavfile.write(path, sr, (audio * 32767).astype(np.int16))
+
+
+def generate_motion_video(path: str, seconds: float, speed: float, seed: int = 0,
+                          size=VIDEO_SIZE, fps: float = VIDEO_FPS) -> None:
+    """
+    生成程序视频：渐变背景上一个匀速运动的方块，speed 控制运动量
+
+    Args:
+        path: 输出 MP4 文件路径
+        seconds: 时长（秒）
+        speed: 方块每帧移动的像素数
+        seed: 颜色和起点的随机种子
+        size: 分辨率 (宽, 高)
+        fps: 帧率
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = np.zeros((height, width, 3), dtype=np.uint8)
+    background[:] = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    background[..., int(rng.integers(0, 3))] //= 2
+    color = tuple(int(c) for c in rng.integers(0, 256, 3))
+    box = max(8, height // 5)
+    x, y = float(rng.uniform(0, width - box)), float(rng.uniform(0, height - box))
+    angle = rng.uniform(0, 2 * np.pi)
+    dx, dy = speed * np.cos(angle), speed * np.sin(angle)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for _ in range(int(round(seconds * fps))):
+            # 碰到边缘时反弹
+            if not 0 <= x + dx <= width - box:
+                dx = -dx
+            if not 0 <= y + dy <= height - box:
+                dy = -dy
+            x, y = x + dx, y + dy
+            frame = background.copy()
+            cv2.rectangle(frame, (int(x), int(y)), (int(x) + box, int(y) + box), color, -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def prepare_scale(scale: BenchmarkScale) -> Dict[str, str]:
+    """
+    生成（或复用已生成的）某个规模的合成素材
+
+    Returns:
+        {"audio": 音频路径, "video_dir": 视频目录}
+    """
+    root = os.path.join(DATA_DIR, scale.name)
+    video_dir = os.path.join(root, "video_files")
+    audio_path = os.path.join(root, f"click_{scale.bpm:g}bpm_{scale.audio_seconds:g}s.wav")
+    os.makedirs(video_dir, exist_ok=True)
+
+    if not os.path.exists(audio_path):
+        print(f"  生成音频: {audio_path}")
+        generate_click_track(audio_path, scale.audio_seconds, scale.bpm)
+
+    rng = np.random.default_rng(1234)
+    lengths = rng.uniform(1.5, 4.0, scale.clips)
+    speeds = rng.uniform(0.0, 8.0, scale.clips)
+    missing = [i for i in range(scale.clips)
+               if not os.path.exists(os.path.join(video_dir, f"clip_{i:04d}.mp4"))]
+    if missing:
+        print(f"  生成 {len(missing)} 个视频...")
+    for i in missing:
+        # 运动速度按分辨率缩放，使不同分辨率下的运动量相同
+        generate_motion_video(os.path.join(video_dir, f"clip_{i:04d}.mp4"), lengths[i],
+                              speeds[i] * scale.video_size[0] / VIDEO_SIZE[0], seed=i, size=scale.video_size)
+
+    return {"audio": audio_path, "video_dir": video_dir}
+
+
+def run_scale(scale: BenchmarkScale, engine: str = "ffmpeg", workers: int = 0,
+              render: Optional[bool] = None) -> Dict[str, float]:
+    """
+    运行一个规模的基准测试（不使用缓存，测量冷启动耗时）
+
+    Args:
+        scale: 测试规模
+        engine: 渲染引擎
+        workers: 素材评分的并行进程数
+        render: 是否渲染，None 表示按规模的默认设置
+
+    Returns:
+        指标名称 -> 数值（耗时单位为秒）
+    """
+    from profiler import StageProfiler, children_peak_rss_mb
+    from rhythm_video_editor import RhythmVideoEditor
+
+    inputs = prepare_scale(scale)
+    output_path = os.path.join(DATA_DIR, scale.name, f"output_{engine}.mp4")
+    profiler = StageProfiler()
+    editor = RhythmVideoEditor(inputs["audio"], inputs["video_dir"], output_path, cache_dir=None,
+                               workers=workers, seed=0, render_profile="draft", profiler=profiler)
+
+    start = time.perf_counter()
+    plan = editor.create_edit_plan(1.0)
+    if scale.render if render is None else render:
+        editor.render_edit_plan(plan, engine=engine)
+    total = time.perf_counter() - start
+
+    stages = profiler.summary()
+    metrics = {f"{name}_seconds": round(stage["wall"], 4) for name, stage in stages.items()
+               if name in ("audio_analysis", "video_scoring", "segment_selection", "render")}
+    metrics["total_seconds"] = round(total, 4)
+
+    # 节拍器音频的 BPM 已知，顺便检查节奏分析的准确性
+    intervals = np.diff(editor.beat_grid.times)
+    metrics["beats"] = len(editor.beat_grid)
+    metrics["median_interval_error"] = round(abs(float(np.median(intervals)) - 60.0 / scale.bpm), 4)
+    metrics["peak_rss_mb"] = round(profiler.report()["peak_rss_mb"] or 0.0, 1)
+    # ru_maxrss 是到目前为止所有已结束子进程中的最大值，包含之前运行的规模
+    metrics["child_peak_rss_mb"] = round(children_peak_rss_mb() or 0.0, 1)
+    metrics["stream_envelope_lag"] = measure_stream_lag(inputs["audio"])
+    return metrics
+
+
+def measure_stream_lag(audio_path: str) -> int:
+    """
+    流式 onset 包络相对 librosa.onset.onset_strength 的偏移帧数（对齐时为0）
+
+    Args:
+        audio_path: 音频文件路径
+
+    Returns:
+        偏移帧数
+    """
+    import librosa
+    from audio_analysis import envelope_lag, stream_onset_envelope
+
+    envelope, _, _ = stream_onset_envelope(audio_path, sr=AUDIO_SAMPLE_RATE)
+    y, _ = librosa.load(audio_path, sr=AUDIO_SAMPLE_RATE)
+    return envelope_lag(librosa.onset.onset_strength(y=y, sr=AUDIO_SAMPLE_RATE), envelope)
+
+
+def measure_startup(repeats: int = 5) -> Dict[str, float]:
+    """
+    测量轻量命令的启动时间（取多次运行的最小值，减少系统抖动的影响）
+
+    Args:
+        repeats: 每个命令的运行次数
+
+    Returns:
+        指标名称 -> 耗时（秒）
+    """
+    commands = {
+        "run_list_seconds": [sys.executable, "run.py", "--list"],
+        "run_check_seconds": [sys.executable, "run.py", "--check"],
+        "import_editor_seconds": [sys.executable, "-c", "import rhythm_video_editor"],
+    }
+    metrics = {}
+    for name, command in commands.items():
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=PACKAGE_DIR, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        metrics[name] = round(min(timings), 4)
+    return metrics
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """
+    与基线比较耗时指标
+
+    Returns:
+        超出容差的指标说明列表
+    """
+    regressions = []
+    for scale_name, metrics in results.items():
+        base = baseline.get(scale_name)
+        if not base:
+            print(f"  {scale_name}: 没有基线")
+            continue
+        for key, value in metrics.items():
+            if not key.endswith("_seconds") or key not in base or base[key] <= 0:
+                continue
+            ratio = value / base[key]
+            flag = "  ⚠️" if ratio > tolerance else ""
+            print(f"  {scale_name:8s} {key:28s} {base[key]:9.3f} -> {value:9.3f}  ({ratio:5.2f}x){flag}")
+            if ratio > tolerance:
+                regressions.append(f"{scale_name}.{key}: {base[key]:.3f}s -> {value:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="节奏视频剪辑器基准测试")
+    parser.add_argument("--scale", nargs="+", choices=list(SCALES), default=["small"], help="测试规模")
+    parser.add_argument("--engine", default="ffmpeg", help="渲染引擎")
+    parser.add_argument("--workers", type=int, default=0, help="素材评分的并行进程数（0表示使用全部CPU核心）")
+    parser.add_argument("--render", action="store_true", help="所有规模都渲染（包括默认跳过渲染的 large）")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="允许的耗时增长倍数")
+    parser.add_argument("--output", type=str, help="把本次结果保存为JSON文件")
+    args = parser.parse_args()
+
+    results = {}
+    print("🚀 启动时间")
+    results["startup"] = measure_startup()
+    for key, value in results["startup"].items():
+        print(f"  {key}: {value}")
+
+    for name in args.scale:
+        scale = SCALES[name]
+        print(f"📏 规模 {name}: {scale.clips} 个视频，音频 {scale.audio_seconds:g} 秒 ({scale.bpm:g} BPM)")
+        results[name] = run_scale(scale, args.engine, args.workers, True if args.render else None)
+        for key, value in results[name].items():
+            print(f"  {key}: {value}")
+
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "engine": args.engine,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get("results", {})
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        report["results"] = {**baseline, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {args.baseline}")
+        return 0
+
+    print("📊 与基线比较:")
+    regressions = compare(results, baseline, args.tolerance)
+    for key in ("run_list_seconds", "run_check_seconds"):
+        if results["startup"][key] > STARTUP_BUDGET:
+            regressions.append(f"startup.{key}: {results['startup'][key]:.3f}s 超过上限 {STARTUP_BUDGET:.1f}s")
+    for name in args.scale:
+        peak = results[name]["child_peak_rss_mb"]
+        if peak > RENDER_MEMORY_BUDGET_MB:
+            regressions.append(f"{name}.child_peak_rss_mb: {peak:.0f}MB 超过上限 {RENDER_MEMORY_BUDGET_MB:.0f}MB")
+        if results[name]["stream_envelope_lag"] != 0:
+            regressions.append(f"{name}.stream_envelope_lag: 流式包络与完整包络相差 "
+                               f"{results[name]['stream_envelope_lag']} 帧")
+    if regressions:
+        print("❌ 发现性能回退:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    print("✅ 没有超出容差的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+磁盘缓存的公共工具
+
+节奏分析缓存、片段缓存和解码音频缓存都把条目保存为目录中的单个文件，
+总大小超过上限时按最近使用时间（修改时间，命中时由 os.utime 更新）淘汰。
+批量任务和服务的多个进程共用同一个缓存目录，文件随时可能被其他进程删除，
+所有文件操作出错时都跳过该条目。
+"""
+
+import os
+import logging
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def evict_lru(cache_dir: str, suffix: str, max_bytes: int, keep: Optional[Iterable[str]] = None,
+              label: str = "缓存") -> None:
+    """
+    缓存超出上限时按最近使用时间删除文件，直到总大小不超过上限
+
+    Args:
+        cache_dir: 缓存目录
+        suffix: 条目文件的扩展名（其他文件，如写入中的临时文件，不参与统计）
+        max_bytes: 缓存总大小上限（字节）
+        keep: 不删除的文件路径（刚写入或本次用到的条目）
+        label: 日志中的缓存名称
+    """
+    keep = set(keep or ())
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            # 已打开或映射该文件的进程不受影响（文件在关闭后才真正释放）
+            os.remove(path)
+            total -= size
+            logger.info(f"淘汰{label}: {os.path.basename(path)}")
+        except OSError:
+            pass
@@ -0,0 +1,154 @@
+"""
+片段分配
+
+为每个节奏点分配一个视频：节奏点的能量（该节奏间隔内 onset 强度的均值）和视频的动态分数
+都换算成分位数，能量越高的节奏点分配动态越强的视频。每个视频在一轮中最多使用 MAX_CLIP_USES 次，
+已使用的次数按 REUSE_PENALTY 计入代价，相邻节奏点不使用同一个视频；所有视频都用满后开始新一轮。
+
+视频按动态分数排序后，每个使用次数各用一个树状数组记录仍可选的位置，
+查询目标分位数两侧最近的视频、移入下一个使用次数都是 O(log 视频数)，
+整体为 O(节奏点数 × log 视频数)。
+"""
+
+from typing import List
+
+import numpy as np
+
+# 每个视频在一轮中的最多使用次数
+MAX_CLIP_USES = 3
+
+# 每多使用一次增加的代价（以分位数距离计），越大越倾向于先用完所有视频
+REUSE_PENALTY = 0.25
+
+
+class _PositionSet:
+    def __init__(self, size: int, full: bool = False):
+        """
+        用树状数组表示的位置集合
+
+        Args:
+            size: 位置数
+            full: 是否初始包含全部位置
+        """
+        self.size = size
+        self.count = size if full else 0
+        self.tree = [0] * (size + 1)
+        if full:
+            for i in range(1, size + 1):
+                self.tree[i] += 1
+                parent = i + (i & -i)
+                if parent <= size:
+                    self.tree[parent] += self.tree[i]
+        self._top = 1 << max(0, size.bit_length() - 1)
+
+    def add(self, position: int, delta: int) -> None:
+        self.count += delta
+        i = position + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def rank(self, position: int) -> int:
+        """位置小于 position 的成员数"""
+        total = 0
+        i = position
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, k: int) -> int:
+        """第 k 个成员（从0开始）的位置"""
+        position = 0
+        step = self._top
+        while step:
+            if position + step <= self.size and self.tree[position + step] <= k:
+                position += step
+                k -= self.tree[position]
+            step >>= 1
+        return position
+
+    def around(self, position: int, count: int = 2) -> List[int]:
+        """position 两侧各最多 count 个最近的成员"""
+        rank = self.rank(position)
+        return [self.select(k) for k in range(max(0, rank - count), min(self.count, rank + count))]
+
+
+def quantiles(values: np.ndarray) -> np.ndarray:
+    """按排名换算的分位数，取值在 (0, 1) 内，相同的值按出现顺序排名"""
+    values = np.asarray(values, dtype=np.float64)
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return (ranks + 0.5) / max(1, len(values))
+
+
+def assign_clips(beat_energy: np.ndarray, clip_motion: np.ndarray, max_uses: int = MAX_CLIP_USES,
+                 reuse_penalty: float = REUSE_PENALTY) -> np.ndarray:
+    """
+    为每个节奏点分配视频
+
+    Args:
+        beat_energy: 每个节奏点的能量
+        clip_motion: 每个视频的动态分数
+        max_uses: 每个视频在一轮中的最多使用次数
+        reuse_penalty: 每多使用一次增加的代价
+
+    Returns:
+        每个节奏点分配到的视频下标
+    """
+    clip_count = len(clip_motion)
+    if clip_count == 0:
+        raise ValueError("没有可分配的视频")
+
+    # positions 按动态分数从低到高排列，order[position] 为对应的视频下标
+    order = np.argsort(np.asarray(clip_motion, dtype=np.float64), kind="stable")
+    motion_q = (np.arange(clip_count) + 0.5) / clip_count
+    energy_q = quantiles(beat_energy)
+    targets = np.searchsorted(motion_q, energy_q).tolist()
+
+    def fresh_levels() -> List[_PositionSet]:
+        return [_PositionSet(clip_count, full=True)] + [_PositionSet(clip_count) for _ in range(max_uses - 1)]
+
+    def search(levels: List[_PositionSet], quantile: float, target: int, previous: int) -> int:
+        best_cost, best = None, -1
+        for uses, level in enumerate(levels):
+            # 代价至少为 reuse_penalty × uses，已经不可能更优时跳过更高的使用次数
+            if not level.count or (best_cost is not None and reuse_penalty * uses >= best_cost):
+                continue
+            for position in level.around(target):
+                if position == previous:
+                    continue
+                cost = abs(motion_q[position] - quantile) + reuse_penalty * uses
+                if best_cost is None or cost < best_cost:
+                    best_cost, best = cost, position
+        return best
+
+    levels = fresh_levels()
+    usage = [0] * clip_count
+    previous = -1
+    result = np.empty(len(energy_q), dtype=np.int64)
+
+    for i, (quantile, target) in enumerate(zip(energy_q.tolist(), targets)):
+        if not any(level.count for level in levels):
+            # 所有视频都用满，开始新一轮
+            levels = fresh_levels()
+            usage = [0] * clip_count
+
+        best = search(levels, quantile, target, previous)
+        if best < 0 and clip_count > 1:
+            # 本轮只剩上一个视频可用，提前开始新一轮，避免相邻节奏点重复
+            levels = fresh_levels()
+            usage = [0] * clip_count
+            best = search(levels, quantile, target, previous)
+        if best < 0:
+            # 只有一个视频，只能重复
+            best = previous
+
+        levels[usage[best]].add(best, -1)
+        usage[best] += 1
+        if usage[best] < max_uses:
+            levels[usage[best]].add(best, 1)
+        result[i] = order[best]
+        previous = best
+
+    return result
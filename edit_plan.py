@@ -0,0 +1,97 @@
+"""
+剪辑规划（EDL）
+
+把 (视频, 开始时间, 结束时间, 目标时长) 片段列表作为独立对象保存，
+可以序列化为 JSON。规划只需执行一次，之后可以重复渲染、分布式渲染，
+或换用其他渲染引擎，而不必重新分析音频和视频素材。
+"""
+
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# JSON 格式版本
+PLAN_FORMAT_VERSION = 1
+
+# 源片段比目标时长短时的补足方式：
+# loop 循环播放，freeze 播放一次后停在最后一帧，stretch 放慢播放速度铺满目标时长
+SHORT_CLIP_MODES = ("loop", "freeze", "stretch")
+
+
+class PlannedSegment(NamedTuple):
+    """规划中的单个片段"""
+    video: str
+    start: float
+    end: float
+    target_duration: float
+
+
+class EditPlan:
+    def __init__(self, audio_path: str, segments: List[PlannedSegment], segment_duration: float,
+                 seed: Optional[int] = None):
+        """
+        初始化剪辑规划
+
+        Args:
+            audio_path: 音频文件路径
+            segments: 片段列表，与节奏点一一对应
+            segment_duration: 规划时使用的片段时长
+            seed: 选择片段时使用的随机种子，用于复现规划
+        """
+        self.audio_path = audio_path
+        self.segments = [PlannedSegment(*segment) for segment in segments]
+        self.segment_duration = segment_duration
+        self.seed = seed
+
+    @property
+    def duration(self) -> float:
+        """规划的总时长（秒）"""
+        return float(sum(segment.target_duration for segment in self.segments))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": PLAN_FORMAT_VERSION,
+            "audio_path": self.audio_path,
+            "segment_duration": self.segment_duration,
+            "seed": self.seed,
+            "segments": [segment._asdict() for segment in self.segments],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EditPlan":
+        version = data.get("version")
+        if version != PLAN_FORMAT_VERSION:
+            raise ValueError(f"不支持的剪辑规划版本: {version}")
+        segments = [PlannedSegment(item["video"], float(item["start"]), float(item["end"]),
+                                   float(item["target_duration"]))
+                    for item in data["segments"]]
+        return cls(data["audio_path"], segments, float(data["segment_duration"]), data.get("seed"))
+
+    def save(self, path: str) -> None:
+        """
+        保存为 JSON 文件
+
+        Args:
+            path: 文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "EditPlan":
+        """
+        从 JSON 文件读取
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            剪辑规划
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def __repr__(self) -> str:
+        return f"EditPlan({len(self.segments)} segments, {self.duration:.1f}s, seed={self.seed})"
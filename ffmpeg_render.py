@@ -0,0 +1,414 @@
+"""
+ffmpeg 渲染引擎
+
+把片段列表转换成一个 ffmpeg 滤镜图（trim/setpts/concat，并混入音轨），
+由单个 ffmpeg 进程完成解码、拼接和编码，视频帧不经过 Python。
+每个片段都是滤镜图中的一个输入，各自有解码器和缩放链，ffmpeg 的内存随输入数增长；
+片段数超过 MAX_CHUNK_INPUTS 时分批编码后无损拼接。
+也可以把片段列表分成多个区块，由多个 ffmpeg 进程并行编码后无损拼接。
+"""
+
+import os
+import logging
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from render_profile import RenderProfile, get_render_profile, DEFAULT_RENDER_PROFILE
+
+logger = logging.getLogger(__name__)
+
+# 单独编码的片段统一使用的时间基，保证无损拼接时时间戳一致
+SEGMENT_TIMESCALE = 90000
+
+# 单个 ffmpeg 进程的滤镜图最多包含的片段输入数（1080p 素材每个输入约占 70MB 内存，
+# 8 个输入时单个进程峰值约 650MB）
+MAX_CHUNK_INPUTS = 8
+
+# (视频路径, 开始时间, 结束时间, 目标时长)
+RenderSegment = Tuple[str, float, float, float]
+
+
+def get_ffmpeg_binary() -> str:
+    """返回 MoviePy 使用的 ffmpeg 可执行文件，保证两个渲染引擎使用同一个 ffmpeg"""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+
+def segment_frame_counts(target_durations: Sequence[float], fps: float) -> np.ndarray:
+    """
+    按累计时间轴计算每个片段的帧数
+
+    每个片段单独取整会让误差逐段累积，导致画面与音频错位；
+    这里对累计边界取整后再求差，总帧数始终与总时长一致。
+
+    Args:
+        target_durations: 每个片段的目标时长
+        fps: 输出帧率
+
+    Returns:
+        每个片段的帧数
+    """
+    boundaries = np.concatenate([[0.0], np.cumsum(np.asarray(target_durations, dtype=np.float64))])
+    frame_boundaries = np.round(boundaries * fps).astype(np.int64)
+    return np.maximum(np.diff(frame_boundaries), 1)
+
+
+def segment_filter_chain(source_duration: float, frame_count: int,
+                         size: Tuple[int, int], fps: float, short_clip_mode: str = "loop") -> str:
+    """
+    生成单个片段的滤镜链：统一帧率和分辨率，短片段按 short_clip_mode 补足，最后裁剪到目标帧数
+
+    短片段的补足方式与 MoviePy 引擎一致：loop 循环播放，freeze 复制最后一帧，
+    stretch 按比例放慢播放速度。
+    """
+    width, height = size
+    source_frames = max(1, int(round(source_duration * fps)))
+    too_short = source_frames < frame_count
+
+    chain = ["setpts=PTS-STARTPTS"]
+    if too_short and short_clip_mode == "stretch":
+        chain.append(f"setpts={frame_count / source_frames:.6f}*PTS")
+    chain += [
+        f"fps={fps}",
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+        "setsar=1",
+        "format=yuv420p",
+    ]
+
+    if too_short and short_clip_mode == "loop":
+        chain.append(f"loop=loop=-1:size={source_frames}:start=0")
+    elif too_short and short_clip_mode == "freeze":
+        chain.append("tpad=stop=-1:stop_mode=clone")
+
+    chain.append(f"trim=end_frame={frame_count}")
+    chain.append("setpts=PTS-STARTPTS")
+    return ",".join(chain)
+
+
+def black_filter_chain(frame_count: int, size: Tuple[int, int], fps: float) -> str:
+    """生成黑色画面的滤镜链（用于无法读取的片段）"""
+    width, height = size
+    return f"color=c=black:s={width}x{height}:r={fps},format=yuv420p,trim=end_frame={frame_count}"
+
+
+@lru_cache(maxsize=None)
+def _source_readable(video_path: str, file_size: int, mtime_ns: int) -> bool:
+    """源文件能否打开并读出时长（按文件大小和修改时间缓存，文件被替换后重新探测）"""
+    from video_index import probe_video
+    return probe_video(video_path)[0] > 0
+
+
+def _segment_usable(segment: RenderSegment) -> bool:
+    video_path, start_time, end_time, _ = segment
+    if end_time <= start_time or not os.path.exists(video_path):
+        return False
+    # 损坏的文件交给 ffmpeg 会使整个渲染失败，先探测，无法读取时用黑色画面代替
+    stat = os.stat(video_path)
+    return _source_readable(video_path, stat.st_size, stat.st_mtime_ns)
+
+
+def _build_video_graph(segments: Sequence[RenderSegment], frame_counts: Sequence[int],
+                       size: Tuple[int, int], fps: float,
+                       short_clip_mode: str = "loop") -> Tuple[List[str], str, int]:
+    """
+    构建片段列表的视频滤镜图
+
+    Returns:
+        (输入参数列表, 滤镜图文本, 视频输入个数)，滤镜图的输出标签为 [outv]
+    """
+    input_args = []
+    filters = []
+    concat_inputs = []
+    input_index = 0
+
+    for i, (segment, frame_count) in enumerate(zip(segments, frame_counts)):
+        video_path, start_time, end_time, _ = segment
+        out_label = f"v{i}"
+
+        if not _segment_usable(segment):
+            # 与 MoviePy 引擎一致，无法使用的片段用黑色画面代替
+            logger.warning(f"处理视频片段 {video_path} 时出错: 无法读取视频")
+            filters.append(f"{black_filter_chain(frame_count, size, fps)}[{out_label}]")
+        else:
+            # 输入级定位，只解码片段所需的部分
+            source_duration = end_time - start_time
+            input_args += ["-ss", f"{start_time:.6f}", "-t", f"{source_duration:.6f}", "-i", video_path]
+            chain = segment_filter_chain(source_duration, int(frame_count), size, fps, short_clip_mode)
+            filters.append(f"[{input_index}:v]{chain}[{out_label}]")
+            input_index += 1
+
+        concat_inputs.append(f"[{out_label}]")
+
+    # setpts 之后输出帧率会变成未知，拼接后重新指定帧率，否则 ffmpeg 会按默认的 25fps 输出
+    filters.append("".join(concat_inputs) + f"concat=n={len(concat_inputs)}:v=1:a=0,fps={fps}[outv]")
+    return input_args, ";\n".join(filters), input_index
+
+
+def build_ffmpeg_command(segments: Sequence[RenderSegment], audio_path: str, output_path: str,
+                         graph_path: str, size: Tuple[int, int], fps: float,
+                         profile: Optional[RenderProfile] = None,
+                         short_clip_mode: str = "loop") -> Tuple[List[str], str]:
+    """
+    构建 ffmpeg 命令和滤镜图
+
+    Args:
+        segments: 片段列表，每个元素为 (视频路径, 开始时间, 结束时间, 目标时长)
+        audio_path: 音频文件路径
+        output_path: 输出文件路径
+        graph_path: 滤镜图脚本的写入路径（片段很多时命令行会过长）
+        size: 输出分辨率 (宽, 高)
+        fps: 输出帧率
+        profile: 编码配置，默认使用 balanced 预设
+        short_clip_mode: 短片段补足方式，"loop"、"freeze" 或 "stretch"
+
+    Returns:
+        (ffmpeg 命令参数列表, 滤镜图文本)
+    """
+    profile = profile or get_render_profile(DEFAULT_RENDER_PROFILE)
+    frame_counts = segment_frame_counts([segment[3] for segment in segments], fps)
+    input_args, graph, input_count = _build_video_graph(segments, frame_counts, size, fps,
+                                                        short_clip_mode)
+
+    command = [get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"] + input_args
+    command += ["-i", audio_path]
+    command += [
+        "-filter_complex_script", graph_path,
+        "-map", "[outv]",
+        "-map", f"{input_count}:a:0",
+    ] + profile.ffmpeg_args() + [
+        "-shortest",
+        output_path,
+    ]
+    return command, graph
+
+
+def run_ffmpeg(command: List[str]) -> None:
+    """
+    执行 ffmpeg 命令
+
+    Args:
+        command: 命令参数列表
+    """
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg 执行失败: {result.stderr.strip()}")
+
+
+def encode_segment(segment: RenderSegment, frame_count: int, size: Tuple[int, int], fps: float,
+                   profile: RenderProfile, output_path: str, short_clip_mode: str = "loop") -> None:
+    """
+    把单个片段编码为独立的视频文件（不含音频），用于之后的无损拼接
+
+    Args:
+        segment: (视频路径, 开始时间, 结束时间, 目标时长)
+        frame_count: 片段帧数
+        size: 输出分辨率 (宽, 高)
+        fps: 输出帧率
+        profile: 编码配置
+        output_path: 输出文件路径（MP4）
+        short_clip_mode: 短片段补足方式
+    """
+    video_path, start_time, end_time, _ = segment
+    command = [get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"]
+
+    if _segment_usable(segment):
+        source_duration = end_time - start_time
+        command += ["-ss", f"{start_time:.6f}", "-t", f"{source_duration:.6f}", "-i", video_path,
+                    "-vf", segment_filter_chain(source_duration, frame_count, size, fps, short_clip_mode)
+                    + f",fps={fps}"]
+    else:
+        logger.warning(f"处理视频片段 {video_path} 时出错: 无法读取视频")
+        command += ["-f", "lavfi", "-i", black_filter_chain(frame_count, size, fps)]
+
+    command += ["-an"] + profile.ffmpeg_args(include_audio=False)
+    command += ["-video_track_timescale", str(SEGMENT_TIMESCALE), "-f", "mp4", output_path]
+    run_ffmpeg(command)
+
+
+def concat_segments(segment_paths: Sequence[str], audio_path: str, output_path: str,
+                    profile: RenderProfile) -> None:
+    """
+    用 concat 分离器无损拼接已编码的片段，并混入音频
+
+    Args:
+        segment_paths: 已编码片段文件列表（编码参数必须完全一致）
+        audio_path: 音频文件路径
+        output_path: 输出文件路径
+        profile: 编码配置（只使用其中的音频参数）
+    """
+    with tempfile.TemporaryDirectory(prefix="rhythm_concat_") as tmp_dir:
+        list_path = os.path.join(tmp_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        command = [
+            get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", audio_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy",
+            "-c:a", profile.audio_codec, "-b:a", profile.audio_bitrate,
+            "-shortest",
+            output_path,
+        ]
+        run_ffmpeg(command)
+
+
+def render_segments(segments: Sequence[RenderSegment], audio_path: str, output_path: str,
+                    size: Tuple[int, int], fps: float, profile: Optional[RenderProfile] = None,
+                    short_clip_mode: str = "loop") -> str:
+    """
+    用单个 ffmpeg 进程渲染片段列表；片段数超过 MAX_CHUNK_INPUTS 时依次分批编码，
+    再用 concat 分离器无损拼接并混入音频，内存占用不随片段数增长
+
+    Args:
+        segments: 片段列表，每个元素为 (视频路径, 开始时间, 结束时间, 目标时长)
+        audio_path: 音频文件路径
+        output_path: 输出文件路径
+        size: 输出分辨率 (宽, 高)
+        fps: 输出帧率
+        profile: 编码配置
+        short_clip_mode: 短片段补足方式
+
+    Returns:
+        输出文件路径
+    """
+    if not segments:
+        raise ValueError("没有可渲染的视频片段")
+
+    with tempfile.TemporaryDirectory(prefix="rhythm_ffmpeg_") as tmp_dir:
+        if len(segments) <= MAX_CHUNK_INPUTS:
+            graph_path = os.path.join(tmp_dir, "filter_graph.txt")
+            command, graph = build_ffmpeg_command(segments, audio_path, output_path,
+                                                  graph_path, size, fps, profile, short_clip_mode)
+            with open(graph_path, "w", encoding="utf-8") as f:
+                f.write(graph)
+
+            logger.info(f"正在用 ffmpeg 渲染 {len(segments)} 个片段...")
+            run_ffmpeg(command)
+            return output_path
+
+        # 帧数按整个时间轴计算，分批不会改变总帧数
+        profile = profile or get_render_profile(DEFAULT_RENDER_PROFILE)
+        frame_counts = segment_frame_counts([segment[3] for segment in segments], fps)
+        batches = split_chunks(frame_counts, 1)
+        logger.info(f"正在用 ffmpeg 分 {len(batches)} 批渲染 {len(segments)} 个片段...")
+        chunk_paths = [
+            encode_chunk(segments[start:end], frame_counts[start:end], size, fps, profile,
+                         os.path.join(tmp_dir, f"batch_{i:04d}.mp4"),
+                         os.path.join(tmp_dir, f"batch_{i:04d}.txt"), short_clip_mode)
+            for i, (start, end) in enumerate(batches)
+        ]
+        concat_segments(chunk_paths, audio_path, output_path, profile)
+
+    return output_path
+
+
+def split_chunks(frame_counts: Sequence[int], chunk_count: int,
+                 max_inputs: int = MAX_CHUNK_INPUTS) -> List[Tuple[int, int]]:
+    """
+    按帧数把片段列表分成连续的区块，使每个区块的编码量大致相同；
+    片段数超过 max_inputs 的区块再均分，限制单个 ffmpeg 进程的输入数（和内存）
+
+    Args:
+        frame_counts: 每个片段的帧数
+        chunk_count: 区块数（至少）
+        max_inputs: 每个区块最多包含的片段数
+
+    Returns:
+        区块列表，每个元素为片段下标范围 (开始, 结束)
+    """
+    cumulative = np.cumsum(frame_counts)
+    chunk_count = max(1, min(chunk_count, len(frame_counts)))
+    targets = cumulative[-1] * np.arange(1, chunk_count) / chunk_count
+    bounds = [0] + np.searchsorted(cumulative, targets, side="right").tolist() + [len(frame_counts)]
+    # 帧数很不均匀时按帧数均分的边界会重合，保证每个区块至少有一个片段，所有工作进程都有事可做
+    for k in range(1, chunk_count):
+        bounds[k] = min(max(bounds[k], bounds[k - 1] + 1), len(frame_counts) - (chunk_count - k))
+
+    chunks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        pieces = -(-(end - start) // max_inputs)
+        for k in range(pieces):
+            chunks.append((int(start + (end - start) * k // pieces),
+                           int(start + (end - start) * (k + 1) // pieces)))
+    return chunks
+
+
+def encode_chunk(segments: Sequence[RenderSegment], frame_counts: Sequence[int],
+                 size: Tuple[int, int], fps: float, profile: RenderProfile,
+                 output_path: str, graph_path: str, short_clip_mode: str = "loop") -> str:
+    """
+    用一个 ffmpeg 进程把连续的若干片段编码为一个不含音频的视频文件
+    """
+    input_args, graph, _ = _build_video_graph(segments, frame_counts, size, fps, short_clip_mode)
+    with open(graph_path, "w", encoding="utf-8") as f:
+        f.write(graph)
+
+    command = [get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"] + input_args
+    command += ["-filter_complex_script", graph_path, "-map", "[outv]", "-an"]
+    command += profile.ffmpeg_args(include_audio=False)
+    command += ["-video_track_timescale", str(SEGMENT_TIMESCALE), "-f", "mp4", output_path]
+    run_ffmpeg(command)
+    return output_path
+
+
+def render_segments_parallel(segments: Sequence[RenderSegment], audio_path: str, output_path: str,
+                             size: Tuple[int, int], fps: float,
+                             profile: Optional[RenderProfile] = None, workers: int = 1,
+                             short_clip_mode: str = "loop") -> str:
+    """
+    把片段列表分块，由多个 ffmpeg 进程并行编码，再用 concat 分离器无损拼接并混入音频；
+    区块数至少为 workers，每个区块最多 MAX_CHUNK_INPUTS 个片段
+
+    Args:
+        segments: 片段列表，每个元素为 (视频路径, 开始时间, 结束时间, 目标时长)
+        audio_path: 音频文件路径
+        output_path: 输出文件路径
+        size: 输出分辨率 (宽, 高)
+        fps: 输出帧率
+        profile: 编码配置，所有区块使用完全相同的编码参数
+        workers: 同时运行的 ffmpeg 进程数
+        short_clip_mode: 短片段补足方式
+
+    Returns:
+        输出文件路径
+    """
+    if not segments:
+        raise ValueError("没有可渲染的视频片段")
+
+    profile = profile or get_render_profile(DEFAULT_RENDER_PROFILE)
+    workers = max(1, workers)
+    if profile.threads is None:
+        # 多个编码进程同时运行，平分CPU核心，避免线程过度竞争
+        profile = profile._replace(threads=max(1, (os.cpu_count() or 1) // workers))
+
+    # 帧数按整个时间轴计算，分块不会改变总帧数
+    frame_counts = segment_frame_counts([segment[3] for segment in segments], fps)
+    chunks = split_chunks(frame_counts, workers)
+
+    with tempfile.TemporaryDirectory(prefix="rhythm_parallel_") as tmp_dir:
+        logger.info(f"正在用 {min(workers, len(chunks))} 个 ffmpeg 进程并行编码 {len(chunks)} 个区块...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(encode_chunk, segments[start:end], frame_counts[start:end], size, fps,
+                                profile, os.path.join(tmp_dir, f"chunk_{i:04d}.mp4"),
+                                os.path.join(tmp_dir, f"chunk_{i:04d}.txt"), short_clip_mode)
+                for i, (start, end) in enumerate(chunks)
+            ]
+            chunk_paths = [future.result() for future in futures]
+
+        concat_segments(chunk_paths, audio_path, output_path, profile)
+
+    return output_path
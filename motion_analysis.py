@@ -0,0 +1,348 @@
+"""
+视频动态分析
+
+计算视频的动态程度分数和按时间窗口划分的动态曲线，并支持用进程池并行分析整个素材库。
+这里的函数都定义在模块级别，以便在子进程中调用。
+cv2 和 tqdm 在用到时才导入，以加快命令行启动。
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shot_detection import ShotDetector, shot_signature, valid_starts
+from video_index import VideoInfo, probe_video
+
+logger = logging.getLogger(__name__)
+
+# 动态分析使用的缩放宽度，降采样后的灰度帧足以衡量画面变化
+ANALYSIS_WIDTH = 160
+
+# 动态评分引擎："sequential" 单次顺序解码；"seek" 逐帧随机定位（旧实现）
+SCORE_ENGINES = ("sequential", "seek")
+
+# 动态曲线的时间窗口（秒）和每秒取帧数
+PROFILE_WINDOW = 0.25
+PROFILE_SAMPLE_RATE = 8
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """
+    解析并行进程数
+
+    Args:
+        workers: 进程数，None 或小于等于0时使用全部CPU核心
+
+    Returns:
+        实际使用的进程数
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def analysis_signature(engine: str = "sequential", sample_frames: int = 10) -> str:
+    """
+    返回动态分析配置的签名，配置变化时索引中的旧分数会被重新计算
+
+    Args:
+        engine: 动态评分引擎
+        sample_frames: 采样帧数
+
+    Returns:
+        签名字符串
+    """
+    return (f"{engine}:{sample_frames}:{ANALYSIS_WIDTH}:{PROFILE_WINDOW}:{PROFILE_SAMPLE_RATE}:"
+            f"{shot_signature()}")
+
+
+def _to_small_gray(frame: np.ndarray) -> np.ndarray:
+    """把BGR帧缩小到分析宽度并转换为灰度图"""
+    import cv2
+    height, width = frame.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        new_height = max(1, int(round(height * ANALYSIS_WIDTH / width)))
+        frame = cv2.resize(frame, (ANALYSIS_WIDTH, new_height), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def _read_frames_by_seek(cap, frame_indices: np.ndarray) -> List[np.ndarray]:
+    """逐个定位到采样帧读取（长GOP视频每次定位都要从关键帧重新解码）"""
+    import cv2
+    frames = []
+    for idx in frame_indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ret, frame = cap.read()
+        if ret:
+            frames.append(_to_small_gray(frame))
+    return frames
+
+
+def _read_frames_sequential(cap, frame_indices: np.ndarray, fps: float,
+                            detector: Optional[ShotDetector] = None) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    单次顺序解码，非采样帧只 grab() 不取回图像
+
+    同一次解码中按 PROFILE_SAMPLE_RATE 取帧计算帧间差异，
+    并按 PROFILE_WINDOW 秒的时间窗口累计，得到动态曲线；
+    同样的采样帧也送入镜头检测器。
+    """
+    import cv2
+    targets = set(int(idx) for idx in frame_indices)
+    step = max(1, int(round(fps / PROFILE_SAMPLE_RATE))) if fps > 0 else 1
+    frames_per_window = fps * PROFILE_WINDOW if fps > 0 else step * 2
+
+    frames = []
+    window_sums: List[float] = []
+    window_counts: List[int] = []
+    previous = None
+    idx = 0
+
+    while True:
+        is_target = idx in targets
+        is_profile = idx % step == 0
+        if is_target or is_profile:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            gray = _to_small_gray(frame)
+            if is_target:
+                frames.append(gray)
+            if is_profile:
+                diff = None
+                if previous is not None:
+                    window = int(idx / frames_per_window)
+                    while len(window_sums) <= window:
+                        window_sums.append(0.0)
+                        window_counts.append(0)
+                    diff = float(np.mean(cv2.absdiff(gray, previous)))
+                    window_sums[window] += diff
+                    window_counts[window] += 1
+                if detector is not None:
+                    detector.feed(idx / fps, gray, diff)
+                previous = gray
+        elif not cap.grab():
+            break
+        idx += 1
+
+    sums = np.asarray(window_sums, dtype=np.float32)
+    counts = np.asarray(window_counts, dtype=np.float32)
+    profile = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return frames, profile
+
+
+def analyze_motion(video_path: str, sample_frames: int = 10,
+                   engine: str = "sequential") -> Tuple[float, np.ndarray, Optional[np.ndarray]]:
+    """
+    计算视频的动态程度分数、动态曲线和镜头列表
+
+    Args:
+        video_path: 视频文件路径
+        sample_frames: 采样帧数
+        engine: 动态评分引擎，"sequential" 或 "seek"（"seek" 不生成动态曲线和镜头列表）
+
+    Returns:
+        (动态程度分数, 每 PROFILE_WINDOW 秒一个值的动态曲线, 镜头列表或 None)
+    """
+    import cv2
+    if engine not in SCORE_ENGINES:
+        raise ValueError(f"未知的动态评分引擎: {engine}")
+
+    empty_profile = np.zeros(0, dtype=np.float32)
+    try:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return 0.0, empty_profile, None
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        if total_frames <= 0:
+            cap.release()
+            return 0.0, empty_profile, None
+
+        # 均匀采样帧
+        frame_indices = np.linspace(0, total_frames-1, sample_frames, dtype=int)
+
+        shots = None
+        if engine == "seek":
+            frames = _read_frames_by_seek(cap, frame_indices)
+            profile = empty_profile
+        else:
+            detector = ShotDetector(1.0 / fps) if fps > 0 else None
+            frames, profile = _read_frames_sequential(cap, frame_indices, fps, detector)
+            if detector is not None:
+                shots = detector.shots(total_frames / fps)
+
+        cap.release()
+
+        if len(frames) < 2:
+            return 0.0, profile, shots
+
+        # 计算帧间差异
+        differences = []
+        for i in range(1, len(frames)):
+            diff = cv2.absdiff(frames[i], frames[i-1])
+            mean_diff = np.mean(diff)
+            differences.append(mean_diff)
+
+        # 返回平均差异作为动态分数
+        return float(np.mean(differences)), profile, shots
+
+    except Exception as e:
+        logger.warning(f"计算视频动态分数时出错: {e}")
+        return 0.0, empty_profile, None
+
+
+def calculate_video_dynamic_score(video_path: str, sample_frames: int = 10,
+                                  engine: str = "sequential") -> float:
+    """
+    计算视频的动态程度分数
+
+    Args:
+        video_path: 视频文件路径
+        sample_frames: 采样帧数
+        engine: 动态评分引擎，"sequential" 或 "seek"
+
+    Returns:
+        动态程度分数
+    """
+    return analyze_motion(video_path, sample_frames, engine)[0]
+
+
+def best_motion_start(profile: np.ndarray, segment_duration: float, video_duration: float,
+                      used: Optional[np.ndarray] = None,
+                      shots: Optional[np.ndarray] = None) -> Optional[float]:
+    """
+    在动态曲线中找出动态最强、且未被使用过的片段起始时间
+
+    Args:
+        profile: 动态曲线
+        segment_duration: 片段时长
+        video_duration: 视频时长
+        used: 与 profile 等长的布尔数组，标记已被选用的时间窗口，选中的窗口会被写入
+        shots: 镜头列表，提供时只考虑完整落在单个镜头内的片段
+
+    Returns:
+        片段开始时间，没有可用窗口时返回 None
+    """
+    span = max(1, int(np.ceil(segment_duration / PROFILE_WINDOW)))
+    if len(profile) < span:
+        return None
+
+    # 滑动窗口求和，得到每个起始窗口的总动态能量
+    cumulative = np.concatenate([[0.0], np.cumsum(profile, dtype=np.float64)])
+    energy = cumulative[span:] - cumulative[:-span]
+
+    if used is not None:
+        used_cumulative = np.concatenate([[0], np.cumsum(used, dtype=np.int64)])
+        overlaps = used_cumulative[span:] - used_cumulative[:-span]
+        energy = np.where(overlaps > 0, -np.inf, energy)
+
+    if shots is not None:
+        start_times = np.arange(len(energy)) * PROFILE_WINDOW
+        energy = np.where(valid_starts(shots, start_times, segment_duration), energy, -np.inf)
+
+    best = int(np.argmax(energy))
+    if not np.isfinite(energy[best]):
+        return None
+
+    if used is not None:
+        used[best:best + span] = True
+
+    max_start = max(0.0, video_duration - segment_duration)
+    return min(best * PROFILE_WINDOW, max_start)
+
+
+def analyze_video_file(video_path: str, sample_frames: int = 10,
+                       engine: str = "sequential") -> VideoInfo:
+    """
+    读取视频元数据并计算动态分数、动态曲线和镜头列表
+
+    Args:
+        video_path: 视频文件路径
+        sample_frames: 采样帧数
+        engine: 动态评分引擎
+
+    Returns:
+        视频信息（包含评分耗时）
+    """
+    duration, fps, width, height, frame_count = probe_video(video_path)
+    start = time.perf_counter()
+    score, profile, shots = analyze_motion(video_path, sample_frames, engine)
+    score_time = time.perf_counter() - start
+    logger.debug(f"动态评分 {os.path.basename(video_path)}: {score:.2f}，"
+                 f"{len(shots) if shots is not None else '?'} 个镜头，耗时 {score_time:.3f} 秒")
+    return VideoInfo(video_path, duration, fps, width, height, frame_count, score, score_time,
+                     profile, shots)
+
+
+def log_scoring_times(infos: List[VideoInfo]) -> None:
+    """
+    输出本次动态评分的耗时统计
+
+    Args:
+        infos: 视频信息列表
+    """
+    if not infos:
+        return
+    times = np.array([info.score_time for info in infos])
+    slowest = infos[int(np.argmax(times))]
+    logger.info(
+        f"动态评分耗时: 共 {times.sum():.2f} 秒，平均每个视频 {times.mean():.3f} 秒，"
+        f"最慢 {os.path.basename(slowest.path)} ({slowest.score_time:.3f} 秒)"
+    )
+
+
+def analyze_video_files(video_paths: List[str], workers: Optional[int] = 1,
+                        max_in_flight: Optional[int] = None, sample_frames: int = 10,
+                        engine: str = "sequential") -> List[VideoInfo]:
+    """
+    批量分析视频文件，workers 大于1时使用进程池并行分析
+
+    Args:
+        video_paths: 视频文件路径列表
+        workers: 并行进程数，None 或小于等于0时使用全部CPU核心
+        max_in_flight: 同时提交的最大任务数，默认是进程数的2倍
+        sample_frames: 采样帧数
+        engine: 动态评分引擎
+
+    Returns:
+        与 video_paths 顺序一致的视频信息列表，单个文件失败时动态分数记为0
+    """
+    from tqdm import tqdm
+    workers = resolve_workers(workers)
+    if workers <= 1 or len(video_paths) <= 1:
+        return [analyze_video_file(path, sample_frames, engine)
+                for path in tqdm(video_paths, desc="分析视频素材")]
+
+    max_in_flight = max_in_flight or workers * 2
+    results: Dict[int, VideoInfo] = {}
+    pending = {}
+    next_index = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(video_paths), desc=f"分析视频素材 ({workers}进程)") as progress:
+        while next_index < len(video_paths) or pending:
+            # 保持提交中的任务数不超过上限，避免一次性占用大量内存
+            while next_index < len(video_paths) and len(pending) < max_in_flight:
+                future = executor.submit(analyze_video_file, video_paths[next_index],
+                                         sample_frames, engine)
+                pending[future] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    path = video_paths[index]
+                    logger.warning(f"计算视频动态分数时出错: {path}: {e}")
+                    results[index] = VideoInfo(path, 0.0, 0.0, 0, 0, 0, 0.0)
+                progress.update(1)
+
+    return [results[i] for i in range(len(video_paths))]
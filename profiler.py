@@ -0,0 +1,213 @@
+"""
+阶段性能分析
+
+记录流水线各阶段（以及各个文件）的墙钟时间、CPU 时间和峰值内存，
+可以导出为 JSON 报告；也可以对指定阶段启用 cProfile 并保存统计结果。
+
+ru_maxrss 是进程启动以来的峰值，之后的阶段只会重复之前的最大值。Linux 上每个阶段开始时
+写入 /proc/self/clear_refs 重置峰值（VmHWM），结束时读取，得到该阶段期间的峰值；
+不支持重置的平台上阶段峰值记为 None，只在报告中给出整个进程的峰值。
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import cProfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 报告格式版本（2：阶段的 peak_rss_mb 为该阶段期间的峰值，而不是进程启动以来的峰值）
+PROFILE_REPORT_VERSION = 2
+
+# 重置 VmHWM 会同时清掉 ru_maxrss，重置前的峰值记录在这里
+_peak_before_reset_mb = 0.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程启动以来的峰值常驻内存（MB），无法获取时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return max(peak, _peak_before_reset_mb)
+
+
+def _current_peak_mb() -> Optional[float]:
+    """自上次重置以来的峰值常驻内存（Linux 的 VmHWM，MB），无法获取时返回 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_peak() -> bool:
+    """重置当前进程的峰值常驻内存，不支持时返回 False"""
+    global _peak_before_reset_mb
+    before = peak_rss_mb()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    _peak_before_reset_mb = max(_peak_before_reset_mb, before or 0.0)
+    return True
+
+
+def children_peak_rss_mb() -> Optional[float]:
+    """已结束的子进程（工作进程、ffmpeg）中最大的峰值常驻内存（MB），无法获取时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _children_cpu() -> float:
+    """已结束的子进程（工作进程、ffmpeg）消耗的 CPU 时间"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StageProfiler:
+    def __init__(self, cprofile_stage: Optional[str] = None, cprofile_path: Optional[str] = None,
+                 listener: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        初始化阶段性能分析器
+
+        Args:
+            cprofile_stage: 启用 cProfile 的阶段名称，None 表示不启用
+            cprofile_path: cProfile 统计结果的保存路径（可用 pstats 或 snakeviz 查看）
+            listener: 每个阶段结束时调用，参数为该阶段的记录（用于实时上报进度）
+        """
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path or "profile.prof"
+        self.listener = listener
+        self.records: List[Dict[str, Any]] = []
+        self._cprofile: Optional[cProfile.Profile] = None
+        # 尚未结束的（嵌套）阶段各自的峰值，重置前把当前峰值计入所有外层阶段
+        self._open_peaks: List[float] = []
+
+    def _fold_peak(self) -> None:
+        current = _current_peak_mb()
+        if current is not None:
+            self._open_peaks = [max(peak, current) for peak in self._open_peaks]
+
+    @contextmanager
+    def stage(self, name: str, file: Optional[str] = None) -> Iterator[None]:
+        """
+        记录一个阶段
+
+        Args:
+            name: 阶段名称
+            file: 阶段处理的文件（按文件统计时使用）
+        """
+        profile = None
+        if name == self.cprofile_stage and self._cprofile is None:
+            profile = self._cprofile = cProfile.Profile()
+            profile.enable()
+
+        self._fold_peak()
+        resettable = _reset_peak()
+        self._open_peaks.append(0.0)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        children_start = _children_cpu()
+        try:
+            yield
+        finally:
+            self._fold_peak()
+            stage_peak = self._open_peaks.pop()
+            record = {
+                "stage": name,
+                "wall": time.perf_counter() - wall_start,
+                "cpu": time.process_time() - cpu_start,
+                "children_cpu": _children_cpu() - children_start,
+                "peak_rss_mb": stage_peak if resettable else None,
+            }
+            if file is not None:
+                record["file"] = file
+            self.records.append(record)
+            if self.listener is not None:
+                self.listener(record)
+
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.cprofile_path)
+                self._cprofile = None
+                logger.info(f"阶段 {name} 的 cProfile 统计已保存到: {self.cprofile_path}")
+
+    def add(self, name: str, wall: float, file: Optional[str] = None) -> None:
+        """
+        添加在其他进程中测得的记录（只有墙钟时间）
+
+        Args:
+            name: 阶段名称
+            wall: 墙钟时间（秒）
+            file: 文件路径
+        """
+        record = {"stage": name, "wall": wall, "cpu": None, "children_cpu": None, "peak_rss_mb": None}
+        if file is not None:
+            record["file"] = file
+        self.records.append(record)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总（不含按文件的记录）"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            if "file" in record:
+                continue
+            total = totals.setdefault(record["stage"], {"count": 0, "wall": 0.0, "cpu": 0.0,
+                                                        "children_cpu": 0.0, "peak_rss_mb": None})
+            total["count"] += 1
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"] or 0.0
+            total["children_cpu"] += record["children_cpu"] or 0.0
+            if record["peak_rss_mb"] is not None:
+                total["peak_rss_mb"] = max(total["peak_rss_mb"] or 0.0, record["peak_rss_mb"])
+        return totals
+
+    def report(self) -> Dict[str, Any]:
+        """生成可序列化的报告"""
+        return {
+            "version": PROFILE_REPORT_VERSION,
+            "pid": os.getpid(),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.summary(),
+            "records": self.records,
+        }
+
+    def save(self, path: str) -> None:
+        """
+        把报告保存为 JSON 文件
+
+        Args:
+            path: 文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def log_summary(self) -> None:
+        """在日志中输出各阶段耗时"""
+        for name, total in self.summary().items():
+            rss = f"，峰值内存 {total['peak_rss_mb']:.0f}MB" if total["peak_rss_mb"] is not None else ""
+            logger.info(f"阶段 {name}: 耗时 {total['wall']:.2f} 秒，CPU {total['cpu']:.2f} 秒，"
+                        f"子进程 CPU {total['children_cpu']:.2f} 秒{rss}")
@@ -0,0 +1,168 @@
+"""
+视频读取器池
+
+渲染时同一个源视频只保留一个解码器（VideoFileClip），多个片段共享；
+打开的读取器数量超过上限时按 LRU 策略关闭最久未使用的读取器，
+之后再次用到该视频时会重新打开。
+
+比目标时长短的片段需要重复使用同一批帧（循环、定格或放慢），
+这些帧只解码一次并保存在有大小上限的内存缓冲区中，不会反复回退定位。
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.video.VideoClip import VideoClip
+
+from edit_plan import SHORT_CLIP_MODES
+from video_index import probe_video
+
+logger = logging.getLogger(__name__)
+
+
+class ReaderPool:
+    def __init__(self, max_open: int = 8, max_height: Optional[int] = None,
+                 max_buffer_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化读取器池
+
+        Args:
+            max_open: 同时打开的读取器数量上限
+            max_height: 解码时的最大高度，更高的视频由 ffmpeg 在解码阶段按比例缩小
+            max_buffer_bytes: 短片段帧缓冲区的大小上限，超出时丢弃最久未使用的帧
+        """
+        self.max_open = max(1, max_open)
+        self.max_height = max_height
+        self.max_buffer_bytes = max_buffer_bytes
+        self._readers: "OrderedDict[str, VideoFileClip]" = OrderedDict()
+        self._frames: "OrderedDict[Tuple[str, float, int], np.ndarray]" = OrderedDict()
+        self._buffer_bytes = 0
+        self.open_count = 0
+        self.buffer_hits = 0
+
+    def get(self, video_path: str) -> VideoFileClip:
+        """
+        获取视频的共享读取器
+
+        Args:
+            video_path: 视频文件路径
+
+        Returns:
+            VideoFileClip（不加载源视频的音轨）
+        """
+        clip = self._readers.get(video_path)
+        if clip is not None:
+            self._readers.move_to_end(video_path)
+            return clip
+
+        target_resolution = None
+        if self.max_height and probe_video(video_path)[3] > self.max_height:
+            target_resolution = (self.max_height, None)
+
+        # 输出视频使用原音频，不需要源视频的音轨
+        clip = VideoFileClip(video_path, audio=False, target_resolution=target_resolution)
+        self._readers[video_path] = clip
+        self.open_count += 1
+
+        while len(self._readers) > self.max_open:
+            _, evicted = self._readers.popitem(last=False)
+            evicted.close()
+
+        return clip
+
+    def subclip(self, video_path: str, start_time: float, end_time: float) -> VideoClip:
+        """
+        创建引用共享读取器的片段，取帧时才从池中获取读取器
+
+        Args:
+            video_path: 视频文件路径
+            start_time: 开始时间
+            end_time: 结束时间
+
+        Returns:
+            片段
+        """
+        source = self.get(video_path)
+        end_time = min(end_time, source.duration)
+        if end_time <= start_time:
+            raise ValueError(f"片段时间超出视频时长: {start_time:.2f}-{end_time:.2f}")
+
+        def make_frame(t):
+            return self.get(video_path).get_frame(start_time + t)
+
+        segment = VideoClip(make_frame, duration=end_time - start_time)
+        segment.fps = source.fps
+        return segment
+
+    def fit(self, video_path: str, start_time: float, end_time: float, target_duration: float,
+            mode: str = "loop") -> VideoClip:
+        """
+        创建时长恰好为目标时长的片段
+
+        源片段较长时直接裁剪；较短时按 mode 补足，重复使用的帧从缓冲区读取。
+
+        Args:
+            video_path: 视频文件路径
+            start_time: 开始时间
+            end_time: 结束时间
+            target_duration: 目标时长
+            mode: 补足方式，"loop"、"freeze" 或 "stretch"
+
+        Returns:
+            片段
+        """
+        if mode not in SHORT_CLIP_MODES:
+            raise ValueError(f"未知的短片段补足方式: {mode}，可选: {', '.join(SHORT_CLIP_MODES)}")
+
+        clip = self.subclip(video_path, start_time, end_time)
+        if clip.duration >= target_duration:
+            return clip.subclip(0, target_duration)
+
+        fps = clip.fps
+        source_duration = clip.duration
+        frame_count = max(1, int(np.floor(source_duration * fps + 1e-6)))
+
+        def source_index(t: float) -> int:
+            if mode == "loop":
+                index = int(np.floor(t * fps + 1e-6)) % frame_count
+            elif mode == "freeze":
+                index = int(np.floor(t * fps + 1e-6))
+            else:
+                index = int(np.floor(t * source_duration / target_duration * fps + 1e-6))
+            return min(index, frame_count - 1)
+
+        def make_frame(t):
+            return self._buffered_frame(video_path, start_time, fps, source_index(t))
+
+        segment = VideoClip(make_frame, duration=target_duration)
+        segment.fps = fps
+        return segment
+
+    def _buffered_frame(self, video_path: str, start_time: float, fps: float, index: int) -> np.ndarray:
+        """从缓冲区读取源片段的第 index 帧，未命中时解码并放入缓冲区"""
+        key = (video_path, start_time, index)
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+            self.buffer_hits += 1
+            return frame
+
+        frame = self.get(video_path).get_frame(start_time + index / fps)
+        self._frames[key] = frame
+        self._buffer_bytes += frame.nbytes
+        while self._buffer_bytes > self.max_buffer_bytes and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            self._buffer_bytes -= evicted.nbytes
+        return frame
+
+    def close(self) -> None:
+        """关闭所有读取器并清空帧缓冲区"""
+        while self._readers:
+            _, clip = self._readers.popitem(last=False)
+            clip.close()
+        self._frames.clear()
+        self._buffer_bytes = 0
+        logger.info(f"渲染过程中共打开视频读取器 {self.open_count} 次，帧缓冲区命中 {self.buffer_hits} 次")
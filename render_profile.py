@@ -0,0 +1,96 @@
+"""
+渲染配置
+
+命名的编码预设，统一控制 x264 preset、CRF、编码线程数、像素格式和音频码率，
+MoviePy 和 ffmpeg 两个渲染引擎使用同一套配置。
+"""
+
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+
+class RenderProfile(NamedTuple):
+    """编码配置"""
+    name: str
+    preset: str
+    crf: int
+    audio_bitrate: str = "192k"
+    threads: Optional[int] = None  # None 表示由 ffmpeg 自动决定（通常使用全部核心）
+    pixel_format: str = "yuv420p"
+    video_codec: str = "libx264"
+    audio_codec: str = "aac"
+
+    def x264_params(self) -> List[str]:
+        """CRF 和像素格式等 MoviePy 没有单独参数的编码选项"""
+        return ["-crf", str(self.crf), "-pix_fmt", self.pixel_format]
+
+    def ffmpeg_args(self, include_audio: bool = True) -> List[str]:
+        """
+        完整的 ffmpeg 编码参数
+
+        Args:
+            include_audio: 是否包含音频编码参数
+
+        Returns:
+            ffmpeg 参数列表
+        """
+        args = ["-c:v", self.video_codec, "-preset", self.preset] + self.x264_params()
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        if include_audio:
+            args += ["-c:a", self.audio_codec, "-b:a", self.audio_bitrate]
+        return args
+
+
+RENDER_PROFILES = {
+    # 快速草稿：编码最快，画质和体积次之
+    "draft": RenderProfile("draft", "ultrafast", 28, audio_bitrate="128k"),
+    # 默认：与 x264 默认参数一致
+    "balanced": RenderProfile("balanced", "medium", 23),
+    # 存档：编码较慢，画质最好
+    "archive": RenderProfile("archive", "slow", 18, audio_bitrate="320k"),
+}
+
+DEFAULT_RENDER_PROFILE = "balanced"
+
+# 快速预览：降低分辨率和帧率，使用最快的编码预设
+PREVIEW_RENDER_PROFILE = "draft"
+PREVIEW_HEIGHT = 360
+PREVIEW_FPS = 15.0
+
+
+def get_render_profile(profile: Union[str, RenderProfile],
+                       threads: Optional[int] = None) -> RenderProfile:
+    """
+    获取编码配置
+
+    Args:
+        profile: 预设名称或编码配置
+        threads: 覆盖配置中的编码线程数
+
+    Returns:
+        编码配置
+    """
+    if isinstance(profile, str):
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"未知的渲染配置: {profile}，可选: {', '.join(RENDER_PROFILES)}")
+        profile = RENDER_PROFILES[profile]
+    if threads:
+        profile = profile._replace(threads=threads)
+    return profile
+
+
+def preview_size(size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    按比例缩小到预览高度，宽高保持为偶数（yuv420p 要求）
+
+    Args:
+        size: 原始分辨率 (宽, 高)
+
+    Returns:
+        预览分辨率 (宽, 高)
+    """
+    width, height = size
+    if height <= PREVIEW_HEIGHT:
+        return width - width % 2, height - height % 2
+    new_width = int(round(width * PREVIEW_HEIGHT / height))
+    return new_width - new_width % 2, PREVIEW_HEIGHT
@@ -1,20 +1,48 @@
 import os
-import librosa
 import numpy as np
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips
-from scipy.signal import find_peaks
-import cv2
-from tqdm import tqdm
 import random
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 import logging
+import time
+from analysis_cache import AnalysisCache
+from audio_store import DecodedAudioStore
+from audio_analysis import should_stream, stream_onset_envelope
+from beat_grid import BeatGrid
+from tempo_tracking import TEMPO_MODES, TempoTrack, track_tempo
+from clip_assignment import assign_clips
+from edit_plan import SHORT_CLIP_MODES, EditPlan, PlannedSegment
+from video_index import VideoIndex, VideoInfo, probe_video
+import ffmpeg_render
+from profiler import StageProfiler
+from segment_cache import SegmentCache
+from shot_detection import random_shot_start, shot_end_at
+from render_profile import (DEFAULT_RENDER_PROFILE, PREVIEW_FPS, PREVIEW_HEIGHT, PREVIEW_RENDER_PROFILE,
+                            RenderProfile, get_render_profile, preview_size)
+from motion_analysis import (analysis_signature, analyze_video_file, analyze_video_files,
+                             best_motion_start, calculate_video_dynamic_score, log_scoring_times,
+                             resolve_workers)
+# librosa、moviepy 和 tqdm 导入较慢，只在用到它们的阶段内导入，
+# 这样 run.py --list / --check 等轻量命令可以快速启动
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 默认缓存目录（节奏分析结果等）
+DEFAULT_CACHE_DIR = ".rhythm_cache"
+
+# 可选的渲染引擎
+RENDER_ENGINES = ("moviepy", "ffmpeg", "cached", "parallel")
+
 class RhythmVideoEditor:
-    def __init__(self, audio_path: str, video_dir: str, output_path: str):
+    def __init__(self, audio_path: str, video_dir: str, output_path: str,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR, workers: int = 1,
+                 score_engine: str = "sequential", start_strategy: str = "motion",
+                 max_open_readers: int = 8, streaming: Optional[bool] = None,
+                 render_profile: Union[str, RenderProfile] = DEFAULT_RENDER_PROFILE,
+                 threads: Optional[int] = None, seed: Optional[int] = None,
+                 short_clip_mode: str = "loop", profiler: Optional[StageProfiler] = None,
+                 tempo_mode: str = "static"):
         """
         初始化节奏视频编辑器
         
@@ -22,59 +50,154 @@ class RhythmVideoEditor:
             audio_path: 音频文件路径
             video_dir: 视频文件目录
             output_path: 输出文件路径
+            cache_dir: 缓存目录，为 None 时不使用缓存
+            workers: 分析视频素材（以及 parallel 引擎编码）的并行进程数，小于等于0时使用全部CPU核心
+            score_engine: 动态评分引擎，"sequential"（单次顺序解码）或 "seek"（逐帧定位）
+            start_strategy: 片段起始时间的选择方式，"motion"（动态最强的时间窗口）或 "random"
+            max_open_readers: 渲染时同时打开的源视频读取器数量上限
+            streaming: 是否流式分析音频，None 表示音频较长（10分钟以上）时自动启用
+            render_profile: 编码配置或预设名称（"draft"、"balanced"、"archive"）
+            threads: 编码线程数，None 表示使用编码配置中的设置
+            seed: 选择视频片段时使用的随机种子，None 表示随机生成
+            short_clip_mode: 源片段比节奏间隔短时的补足方式，"loop"（循环）、"freeze"（定格最后一帧）
+                或 "stretch"（放慢速度铺满间隔）
+            profiler: 阶段性能分析器，None 表示新建一个（各阶段耗时总会被记录，是否导出报告由调用方决定）
+            tempo_mode: 速度模式，"static"（全局单一速度）或 "dynamic"（跟踪速度变化，
+                onset 吸附到局部节拍网格，最小间隔按局部速度缩放）
         """
+        if short_clip_mode not in SHORT_CLIP_MODES:
+            raise ValueError(f"未知的短片段补足方式: {short_clip_mode}，可选: {', '.join(SHORT_CLIP_MODES)}")
+        if tempo_mode not in TEMPO_MODES:
+            raise ValueError(f"未知的速度模式: {tempo_mode}，可选: {', '.join(TEMPO_MODES)}")
         self.audio_path = audio_path
         self.video_dir = video_dir
         self.output_path = output_path
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.score_engine = score_engine
+        self.start_strategy = start_strategy
+        self.max_open_readers = max_open_readers
+        self.short_clip_mode = short_clip_mode
+        self.tempo_mode = tempo_mode
+        self.profiler = profiler or StageProfiler()
+        self.streaming = streaming
+        self.render_profile = get_render_profile(render_profile, threads)
         self.beat_times = []
+        self.beat_grid: Optional[BeatGrid] = None
+        self.tempo_track: Optional[TempoTrack] = None
+        # 节拍跟踪使用的 onset 强度包络及每帧时长，用于计算每个节奏点的能量
+        self.energy_envelope: Optional[np.ndarray] = None
+        self.energy_period = 0.0
         self.video_clips = []
         self.audio_clip = None
-        
-    def analyze_audio_rhythm(self, hop_length: int = 512, sr: int = 22050) -> List[float]:
+        self.analysis_cache = AnalysisCache(os.path.join(cache_dir, "analysis")) if cache_dir else None
+        self.video_index = VideoIndex(os.path.join(cache_dir, "video_index.sqlite"),
+                                      analysis_signature(score_engine)) if cache_dir else None
+        self.segment_cache = SegmentCache(os.path.join(cache_dir, "segments")) if cache_dir else None
+        self.audio_store = DecodedAudioStore(os.path.join(cache_dir, "audio")) if cache_dir else None
+        self.video_info: Dict[str, VideoInfo] = {}
+        # 已载入内存的视频信息对应的 (文件大小, 修改时间)，刷新时只从索引重新读取变化的文件
+        self._video_keys: Dict[str, Tuple[int, float]] = {}
+        self.edit_plan: Optional[EditPlan] = None
+        # 未指定种子时随机生成一个，并记录在剪辑规划中，以便复现
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        
+    def analyze_audio_rhythm(self, hop_length: int = 512, sr: int = 22050,
+                             min_gap: float = 0.3) -> BeatGrid:
         """
         分析音频节奏，提取节拍时间点
         
         Args:
             hop_length: 音频分析步长
             sr: 采样率
+            min_gap: 相邻节奏点的最小间隔（秒），动态速度模式下为 120 BPM 时的间隔
             
         Returns:
-            节拍时间点列表（秒）
+            节奏点网格（可像列表一样按下标访问节拍时间点，单位为秒）
         """
         logger.info("开始分析音频节奏...")
         
-        # 加载音频文件
-        y, sr = librosa.load(self.audio_path, sr=sr)
-        
-        # 提取节拍
-        tempo, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop_length)
-        
-        # 将节拍帧转换为时间
-        beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=hop_length)
-        
-        # 提取onset（音频起始点）
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, hop_length=hop_length)
-        onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=hop_length)
-        
-        # 结合节拍和onset，去重并排序
-        all_times = np.concatenate([beat_times, onset_times])
-        all_times = np.unique(all_times)
-        all_times.sort()
-        
-        # 过滤太密集的时间点（间隔小于0.3秒的）
-        filtered_times = [all_times[0]]
-        for time in all_times[1:]:
-            if time - filtered_times[-1] >= 0.3:
-                filtered_times.append(time)
-        
-        self.beat_times = filtered_times
-        logger.info(f"检测到 {len(self.beat_times)} 个节奏点，音乐速度: {tempo:.1f} BPM")
-        
-        return self.beat_times
+        streaming = self.streaming if self.streaming is not None else should_stream(self.audio_path)
+        params = {'hop_length': hop_length, 'sr': sr, 'streaming': streaming, 'tempo_mode': self.tempo_mode}
+        cached = self.analysis_cache.load(self.audio_path, params) if self.analysis_cache else None
+        
+        if cached is not None:
+            logger.info("命中节奏分析缓存，跳过音频解码")
+            tempo = float(cached['tempo'])
+            beat_times = cached['beat_times']
+            onset_times = cached['onset_times']
+            self.energy_envelope = cached['energy_envelope']
+            self.energy_period = float(cached['energy_period'])
+            if self.tempo_mode == "dynamic":
+                self.tempo_track = TempoTrack(**{name: cached[name] for name in TempoTrack._fields})
+        else:
+            # 只在缓存未命中时导入 librosa
+            import librosa
+            
+            if streaming:
+                # 流式计算 onset 包络，再在包络上检测节拍，不载入整条波形
+                logger.info("使用流式分析音频...")
+                onset_envelope, sr, hop_length = stream_onset_envelope(self.audio_path, hop_length, sr)
+                beat_envelope = onset_envelope
+            elif self.audio_store:
+                # 节拍跟踪（中位数聚合）和 onset 检测（平均值聚合）使用的包络写入共享缓存，
+                # 其他进程直接映射读取
+                beat_envelope = self.audio_store.onset_envelope(self.audio_path, sr, hop_length, "median")
+                onset_envelope = self.audio_store.onset_envelope(self.audio_path, sr, hop_length, "mean")
+            else:
+                y, sr = librosa.load(self.audio_path, sr=sr)
+                beat_envelope = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length,
+                                                             aggregate=np.median)
+                onset_envelope = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+            
+            self.energy_envelope = np.asarray(beat_envelope, dtype=np.float32)
+            self.energy_period = hop_length / sr
+            
+            # 提取onset（音频起始点）
+            onset_frames = librosa.onset.onset_detect(onset_envelope=onset_envelope, sr=sr,
+                                                      hop_length=hop_length)
+            onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=hop_length)
+            
+            if self.tempo_mode == "dynamic":
+                # 逐帧跟踪速度，得到跟随速度变化的节拍网格，并把 onset 吸附到网格上
+                self.tempo_track = track_tempo(beat_envelope, onset_times, sr, hop_length)
+                tempo = float(np.median(self.tempo_track.curve_bpm))
+                beat_times = self.tempo_track.beat_times
+                onset_times = self.tempo_track.onset_times
+                extra = self.tempo_track._asdict()
+            else:
+                # 提取节拍，并将节拍帧转换为时间
+                tempo, beats = librosa.beat.beat_track(onset_envelope=beat_envelope, sr=sr,
+                                                       hop_length=hop_length)
+                tempo = float(np.atleast_1d(tempo)[0])
+                beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=hop_length)
+                extra = {}
+            
+            if self.analysis_cache:
+                self.analysis_cache.store(self.audio_path, params, **{
+                    **extra, 'tempo': np.array(tempo), 'beat_times': beat_times, 'onset_times': onset_times,
+                    'energy_envelope': self.energy_envelope, 'energy_period': np.array(self.energy_period)})
+        
+        # 结合节拍和onset，去重排序，并过滤太密集的时间点（间隔小于 min_gap 的）；
+        # 动态速度模式下 min_gap 是参考速度下的间隔，按各点的局部速度缩放
+        if self.tempo_mode == "dynamic":
+            track = self.tempo_track
+            self.beat_grid = BeatGrid.from_events(beat_times, onset_times,
+                                                  min_gap=lambda times: track.min_gaps(times, min_gap),
+                                                  downbeats=track.downbeat_times)
+            logger.info(f"速度范围 {track.curve_bpm.min():.1f}-{track.curve_bpm.max():.1f} BPM，"
+                        f"{len(track.downbeat_times)} 个小节")
+        else:
+            self.beat_grid = BeatGrid.from_events(beat_times, onset_times, min_gap=min_gap)
+        self.beat_times = self.beat_grid.times
+        logger.info(f"检测到 {len(self.beat_grid)} 个节奏点，音乐速度: {tempo:.1f} BPM")
+        
+        return self.beat_grid
     
     def load_video_files(self) -> List[str]:
         """
-        加载视频文件列表
+        加载视频文件列表，并刷新视频素材索引
         
         Returns:
             视频文件路径列表
@@ -82,13 +205,104 @@ class RhythmVideoEditor:
         video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
         video_files = []
         
-        for file in os.listdir(self.video_dir):
+        for file in sorted(os.listdir(self.video_dir)):
             if any(file.lower().endswith(ext) for ext in video_extensions):
                 video_files.append(os.path.join(self.video_dir, file))
         
         logger.info(f"找到 {len(video_files)} 个视频文件")
+        with self.profiler.stage("video_index"):
+            self.refresh_video_info(video_files)
         return video_files
     
+    def analyze_video_file(self, video_path: str) -> VideoInfo:
+        """
+        读取视频元数据并计算动态分数
+        
+        Args:
+            video_path: 视频文件路径
+            
+        Returns:
+            视频信息
+        """
+        return analyze_video_file(video_path, engine=self.score_engine)
+    
+    def refresh_video_info(self, video_files: List[str]) -> Dict[str, VideoInfo]:
+        """
+        刷新视频信息，只分析索引中没有或已变化的文件
+        
+        Args:
+            video_files: 视频文件路径列表
+            
+        Returns:
+            路径 -> 视频信息
+        """
+        if self.video_index:
+            stale_files = self.video_index.stale_files(video_files)
+        else:
+            # 没有持久化索引时，本次会话中已分析过的文件不再重复分析
+            stale_files = [path for path in video_files if path not in self.video_info]
+        
+        infos = []
+        if stale_files:
+            logger.info(f"分析 {len(stale_files)} 个新增或变化的视频文件...")
+            with self.profiler.stage("video_scoring"):
+                infos = analyze_video_files(stale_files, workers=self.workers, engine=self.score_engine)
+            log_scoring_times(infos)
+            # 评分在工作进程中完成，按文件只记录墙钟时间
+            for info in infos:
+                self.profiler.add("video_scoring", info.score_time, file=info.path)
+        
+        if self.video_index:
+            self.video_index.update(infos)
+            # 内存中已有且文件未变化的视频信息直接保留，只读取新增、变化或重新分析过的文件
+            keys = {}
+            for path in video_files:
+                stat = os.stat(path)
+                keys[path] = (stat.st_size, stat.st_mtime)
+            reload = set(stale_files)
+            reload.update(path for path in video_files
+                          if path not in self.video_info or self._video_keys.get(path) != keys[path])
+            loaded = self.video_index.get_many([path for path in video_files if path in reload])
+            known = {**self.video_info, **loaded}
+            self.video_info = {path: known[path] for path in video_files if path in known}
+            self._video_keys = {path: keys[path] for path in self.video_info}
+        else:
+            known = {**self.video_info, **{info.path: info for info in infos}}
+            self.video_info = {path: known[path] for path in video_files if path in known}
+        
+        return self.video_info
+    
+    def use_library(self, library: "RhythmVideoEditor") -> None:
+        """
+        复用另一个编辑器已载入的视频信息和节奏分析缓存（包括音频内容哈希），
+        之后的刷新只检查文件是否变化，常驻进程中的多个任务不必每次重新读取整个索引
+
+        Args:
+            library: 已加载素材库的编辑器
+        """
+        self.video_info = dict(library.video_info)
+        self._video_keys = dict(library._video_keys)
+        if library.analysis_cache is not None:
+            self.analysis_cache = library.analysis_cache
+    
+    def get_video_info(self, video_path: str) -> VideoInfo:
+        """
+        获取视频信息，每个文件在本次会话中只探测一次
+        
+        Args:
+            video_path: 视频文件路径
+            
+        Returns:
+            视频信息
+        """
+        info = self.video_info.get(video_path)
+        if info is None:
+            with self.profiler.stage("probe", file=video_path):
+                duration, fps, width, height, frame_count = probe_video(video_path)
+            info = VideoInfo(video_path, duration, fps, width, height, frame_count, 0.0)
+            self.video_info[video_path] = info
+        return info
+    
     def calculate_video_dynamic_score(self, video_path: str, sample_frames: int = 10) -> float:
         """
         计算视频的动态程度分数
@@ -100,43 +314,7 @@ class RhythmVideoEditor:
         Returns:
             动态程度分数
         """
-        try:
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                return 0.0
-            
-            frames = []
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            # 均匀采样帧
-            frame_indices = np.linspace(0, total_frames-1, sample_frames, dtype=int)
-            
-            for idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                if ret:
-                    # 转换为灰度图
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    frames.append(gray)
-            
-            cap.release()
-            
-            if len(frames) < 2:
-                return 0.0
-            
-            # 计算帧间差异
-            differences = []
-            for i in range(1, len(frames)):
-                diff = cv2.absdiff(frames[i], frames[i-1])
-                mean_diff = np.mean(diff)
-                differences.append(mean_diff)
-            
-            # 返回平均差异作为动态分数
-            return np.mean(differences)
-            
-        except Exception as e:
-            logger.warning(f"计算视频动态分数时出错: {e}")
-            return 0.0
+        return calculate_video_dynamic_score(video_path, sample_frames, self.score_engine)
     
     def select_video_segments(self, segment_duration: float = 1.0) -> List[Tuple[str, float, float]]:
         """
@@ -152,46 +330,55 @@ class RhythmVideoEditor:
         if not video_files:
             raise ValueError("没有找到视频文件")
         
-        # 计算每个视频的动态分数
-        video_scores = {}
-        for video_path in video_files:
-            score = self.calculate_video_dynamic_score(video_path)
-            video_scores[video_path] = score
-        
-        # 按动态分数排序视频
-        sorted_videos = sorted(video_scores.items(), key=lambda x: x[1], reverse=True)
+        # 从视频索引读取每个视频的动态分数；分析失败（读不出时长）的视频不参与分配，
+        # 否则会按分位数分到一部分节奏点，每次都落入下面的出错分支
+        videos = [video for video, info in self.video_info.items() if info.duration > 0]
+        if not videos:
+            raise ValueError("没有可以读取的视频文件")
+        skipped = len(self.video_info) - len(videos)
+        if skipped:
+            logger.warning(f"跳过 {skipped} 个无法读取的视频文件")
+        motion_scores = np.array([self.video_info[video].motion_score for video in videos])
+        
+        # 每个节奏点的能量：节奏间隔内 onset 强度的均值；没有包络时以切换密度代替（间隔越短能量越高）
+        beat_grid = self.beat_grid if self.beat_grid is not None else BeatGrid(self.beat_times)
+        if self.energy_envelope is not None:
+            beat_energy = beat_grid.segment_energy(self.energy_envelope, self.energy_period, segment_duration)
+        else:
+            beat_energy = -beat_grid.target_durations(segment_duration)
+        
+        # 能量高的节奏点分配动态强的视频，每个视频每轮最多使用3次，相邻节奏点不重复
+        assignment = assign_clips(beat_energy, motion_scores)
         
         segments = []
-        video_usage_count = {video: 0 for video in video_scores.keys()}
+        # 每个视频动态曲线中已被选用的时间窗口，避免重复选中同一段画面
+        used_windows = {}
         
-        for i, beat_time in enumerate(self.beat_times):
-            # 选择使用次数最少的视频，优先选择动态分数高的
-            available_videos = [(video, score) for video, score in sorted_videos 
-                              if video_usage_count[video] < 3]  # 限制每个视频最多使用3次
-            
-            if not available_videos:
-                # 如果所有视频都使用过多，重置计数
-                video_usage_count = {video: 0 for video in video_scores.keys()}
-                available_videos = sorted_videos
+        for clip_index in assignment:
+            selected_video = videos[clip_index]
             
-            # 选择视频
-            selected_video = available_videos[0][0]
-            video_usage_count[selected_video] += 1
-            
-            # 获取视频时长
+            # 获取视频时长（使用已缓存的视频信息，不再为每个节拍打开视频）
             try:
-                clip = VideoFileClip(selected_video)
-                video_duration = clip.duration
-                clip.close()
+                video_duration = self.get_video_info(selected_video).duration
+                if video_duration <= 0:
+                    raise ValueError("无法读取视频时长")
                 
-                # 随机选择开始时间，确保片段完整
-                max_start = max(0, video_duration - segment_duration)
-                if max_start > 0:
-                    start_time = random.uniform(0, max_start)
-                else:
-                    start_time = 0
+                # 优先选择动态曲线中动态最强的时间窗口（只考虑完整落在单个镜头内的窗口）
+                start_time = None
+                info = self.get_video_info(selected_video)
+                profile = info.motion_profile
+                if self.start_strategy == "motion" and profile is not None and len(profile):
+                    used = used_windows.setdefault(selected_video, np.zeros(len(profile), dtype=bool))
+                    start_time = best_motion_start(profile, segment_duration, video_duration, used,
+                                                   info.shots)
                 
-                end_time = min(start_time + segment_duration, video_duration)
+                # 没有可用的动态曲线时在单个镜头内随机选择开始时间，确保片段完整
+                if start_time is None:
+                    start_time = random_shot_start(info.shots, segment_duration, video_duration, self.rng)
+                
+                # 片段不跨越源视频自带的镜头切换，镜头不够长时片段会被截短，渲染时按短片段补足
+                end_time = min(start_time + segment_duration,
+                               shot_end_at(info.shots, start_time, video_duration))
                 
                 segments.append((selected_video, start_time, end_time))
                 
@@ -201,69 +388,236 @@ class RhythmVideoEditor:
                 if segments:
                     segments.append(segments[-1])  # 重复上一个片段
                 else:
-                    # 如果还没有片段，创建一个默认的
-                    segments.append((video_files[0], 0, segment_duration))
+                    # 如果还没有片段，从第一个可读取的视频开头截取
+                    segments.append((videos[0], 0, min(segment_duration, self.video_info[videos[0]].duration)))
         
         return segments
     
-    def create_rhythm_video(self, segment_duration: float = 1.0) -> str:
+    def segment_target_durations(self, segment_count: int, segment_duration: float = 1.0) -> np.ndarray:
+        """
+        计算每个片段需要匹配的节奏时长
+        
+        Args:
+            segment_count: 片段数量
+            segment_duration: 最后一个片段（没有下一个节奏点）的持续时间
+            
+        Returns:
+            目标时长数组
+        """
+        target_durations = self.beat_grid.target_durations(segment_duration)[:segment_count]
+        if len(target_durations) < segment_count:
+            padding = np.full(segment_count - len(target_durations), segment_duration)
+            target_durations = np.concatenate([target_durations, padding])
+        return target_durations
+    
+    def create_edit_plan(self, segment_duration: float = 1.0) -> EditPlan:
+        """
+        规划视频片段；同一个片段时长只规划一次，预览和最终渲染使用同一份规划
+        
+        Args:
+            segment_duration: 每个片段的持续时间
+            
+        Returns:
+            剪辑规划
+        """
+        if self.edit_plan is not None and self.edit_plan.segment_duration == segment_duration:
+            return self.edit_plan
+        
+        # 分析音频节奏
+        if self.beat_grid is None:
+            with self.profiler.stage("audio_analysis"):
+                self.analyze_audio_rhythm()
+        
+        # 选择视频片段（每次规划都从同一个种子开始，保证规划可以复现）
+        self.rng.seed(self.seed)
+        # 选片阶段包含素材索引刷新（video_index 阶段单独记录）
+        with self.profiler.stage("segment_selection"):
+            segments = self.select_video_segments(segment_duration)
+        target_durations = self.segment_target_durations(len(segments), segment_duration)
+        
+        self.edit_plan = EditPlan(
+            self.audio_path,
+            [PlannedSegment(video_path, float(start_time), float(end_time), float(target_duration))
+             for (video_path, start_time, end_time), target_duration in zip(segments, target_durations)],
+            segment_duration,
+            self.seed,
+        )
+        return self.edit_plan
+    
+    def preview_output_path(self) -> str:
+        """预览文件路径：在输出文件名后加 _preview"""
+        root, ext = os.path.splitext(self.output_path)
+        return f"{root}_preview{ext or '.mp4'}"
+    
+    def create_rhythm_video(self, segment_duration: float = 1.0, engine: str = "moviepy",
+                            preview: bool = False, plan: Optional[EditPlan] = None) -> str:
         """
         创建节奏视频
         
         Args:
             segment_duration: 每个片段的持续时间
+            engine: 渲染引擎，"moviepy"（逐帧合成）、"ffmpeg"（单个 ffmpeg 滤镜图）
+                、"cached"（逐片段编码并缓存，重新渲染时只编码变化的片段）
+                或 "parallel"（分块并行编码后无损拼接）
+            preview: 是否只生成低分辨率、低帧率的快速预览（使用与最终渲染相同的片段规划）
+            plan: 已有的剪辑规划，提供时直接渲染，不再分析音频和视频素材
             
         Returns:
             输出文件路径
         """
-        logger.info("开始创建节奏视频...")
+        if plan is None:
+            plan = self.create_edit_plan(segment_duration)
+        return self.render_edit_plan(plan, engine=engine, preview=preview)
+    
+    def render_edit_plan(self, plan: EditPlan, engine: str = "moviepy", preview: bool = False) -> str:
+        """
+        按剪辑规划渲染视频
         
-        # 分析音频节奏
-        if not self.beat_times:
-            self.analyze_audio_rhythm()
+        Args:
+            plan: 剪辑规划
+            engine: 渲染引擎
+            preview: 是否只生成快速预览
+            
+        Returns:
+            输出文件路径
+        """
+        if engine not in RENDER_ENGINES:
+            raise ValueError(f"未知的渲染引擎: {engine}")
+        if not plan.segments:
+            raise ValueError("剪辑规划中没有视频片段")
+        
+        logger.info("开始创建节奏预览..." if preview else "开始创建节奏视频...")
+        
+        output_path = self.preview_output_path() if preview else self.output_path
+        if preview:
+            profile = get_render_profile(PREVIEW_RENDER_PROFILE, self.render_profile.threads)
+        else:
+            profile = self.render_profile
+        
+        logger.info(f"正在导出视频到: {output_path}（渲染配置: {profile.name}）")
+        export_start = time.perf_counter()
+        with self.profiler.stage("render"):
+            if engine == "ffmpeg":
+                self._render_with_ffmpeg(plan, output_path, profile, preview)
+            elif engine == "cached":
+                self._render_with_segment_cache(plan, output_path, profile, preview)
+            elif engine == "parallel":
+                self._render_in_parallel(plan, output_path, profile, preview)
+            else:
+                self._render_with_moviepy(plan, output_path, profile, preview)
+        self._log_encode_speed(output_path, time.perf_counter() - export_start)
         
-        # 选择视频片段
-        segments = self.select_video_segments(segment_duration)
+        logger.info("视频创建完成！")
+        return output_path
+    
+    def create_preview(self, segment_duration: float = 1.0, engine: str = "ffmpeg") -> str:
+        """
+        生成快速预览：降低分辨率和帧率并使用最快的编码预设，用于检查剪辑节奏
+        
+        Args:
+            segment_duration: 每个片段的持续时间
+            engine: 渲染引擎
+            
+        Returns:
+            预览文件路径
+        """
+        return self.create_rhythm_video(segment_duration, engine=engine, preview=True)
+    
+    def _output_format(self, plan: EditPlan, preview: bool) -> Tuple[Tuple[int, int], float]:
+        """
+        ffmpeg 引擎的输出格式：分辨率取第一个片段的分辨率，帧率取所用视频的最高帧率
+        """
+        infos = [self.get_video_info(segment.video) for segment in plan.segments]
+        first = next((info for info in infos if info.width > 0 and info.height > 0), None)
+        size = (first.width, first.height) if first else (1920, 1080)
+        fps = max((info.fps for info in infos if info.fps > 0), default=30.0)
+        if preview:
+            size = preview_size(size)
+            fps = min(fps, PREVIEW_FPS)
+        return size, fps
+    
+    def _render_with_ffmpeg(self, plan: EditPlan, output_path: str,
+                            profile: RenderProfile, preview: bool) -> None:
+        """
+        用单个 ffmpeg 滤镜图渲染
+        """
+        size, fps = self._output_format(plan, preview)
+        ffmpeg_render.render_segments(plan.segments, plan.audio_path, output_path, size, fps, profile,
+                                      self.short_clip_mode)
+    
+    def _render_with_segment_cache(self, plan: EditPlan, output_path: str,
+                                   profile: RenderProfile, preview: bool) -> None:
+        """
+        逐片段编码并缓存，再无损拼接；未启用缓存目录时退回单个 ffmpeg 滤镜图
+        """
+        if self.segment_cache is None:
+            logger.warning("未启用缓存目录，改用 ffmpeg 引擎渲染")
+            self._render_with_ffmpeg(plan, output_path, profile, preview)
+            return
+        size, fps = self._output_format(plan, preview)
+        self.segment_cache.render(plan.segments, plan.audio_path, output_path, size, fps, profile,
+                                  self.short_clip_mode)
+    
+    def _render_in_parallel(self, plan: EditPlan, output_path: str,
+                            profile: RenderProfile, preview: bool) -> None:
+        """
+        分块并行编码，进程数与视频分析的并行进程数相同
+        """
+        size, fps = self._output_format(plan, preview)
+        ffmpeg_render.render_segments_parallel(plan.segments, plan.audio_path, output_path, size, fps,
+                                               profile, workers=resolve_workers(self.workers),
+                                               short_clip_mode=self.short_clip_mode)
+    
+    def _log_encode_speed(self, output_path: str, elapsed: float) -> None:
+        """
+        输出导出阶段的编码速度（帧/秒）
+        """
+        _, _, _, _, frame_count = probe_video(output_path)
+        if frame_count > 0 and elapsed > 0:
+            logger.info(f"导出耗时 {elapsed:.1f} 秒，共 {frame_count} 帧，编码速度 {frame_count / elapsed:.1f} 帧/秒")
+    
+    def _render_with_moviepy(self, plan: EditPlan, output_path: str,
+                             profile: RenderProfile, preview: bool) -> None:
+        """
+        用 MoviePy 逐帧合成并导出；预览时由 ffmpeg 在解码阶段直接缩小源视频
+        """
+        from moviepy.editor import AudioFileClip, concatenate_videoclips
+        from tqdm import tqdm
+        from reader_pool import ReaderPool
         
-        # 创建视频片段
+        # 创建视频片段，同一源视频的片段共享读取器
         video_clips = []
+        # 无法读取的片段用黑色画面代替，分辨率与 ffmpeg 引擎的输出相同
+        fallback_size, _ = self._output_format(plan, preview)
+        reader_pool = ReaderPool(self.max_open_readers, PREVIEW_HEIGHT if preview else None)
         logger.info("正在处理视频片段...")
         
-        for i, (video_path, start_time, end_time) in enumerate(tqdm(segments, desc="处理视频片段")):
-            try:
-                clip = VideoFileClip(video_path).subclip(start_time, end_time)
-                
-                # 调整片段时长以匹配节奏
-                if i < len(self.beat_times) - 1:
-                    target_duration = self.beat_times[i + 1] - self.beat_times[i]
-                else:
-                    target_duration = segment_duration
-                
-                # 如果片段太短，循环播放；如果太长，裁剪
-                if clip.duration < target_duration:
-                    # 循环播放直到达到目标时长
-                    loops_needed = int(np.ceil(target_duration / clip.duration))
-                    clip = concatenate_videoclips([clip] * loops_needed)
-                    clip = clip.subclip(0, target_duration)
-                elif clip.duration > target_duration:
-                    clip = clip.subclip(0, target_duration)
-                
-                video_clips.append(clip)
-                
-            except Exception as e:
-                logger.warning(f"处理视频片段 {video_path} 时出错: {e}")
-                # 如果出错，创建一个黑色片段
-                from moviepy.video.VideoClip import ColorClip
-                fallback_clip = ColorClip(size=(1920, 1080), color=(0, 0, 0), duration=segment_duration)
-                video_clips.append(fallback_clip)
+        with self.profiler.stage("segment_building"):
+            for video_path, start_time, end_time, target_duration in tqdm(plan.segments, desc="处理视频片段"):
+                try:
+                    # 如果片段太长则裁剪，太短则按 short_clip_mode 补足（目标时长是规划时预先计算好的节奏间隔）
+                    clip = reader_pool.fit(video_path, start_time, end_time, target_duration,
+                                           self.short_clip_mode)
+                    video_clips.append(clip)
+                    
+                except Exception as e:
+                    logger.warning(f"处理视频片段 {video_path} 时出错: {e}")
+                    # 如果出错，创建一个与节奏间隔等长的黑色片段，后面的片段仍然踩在节拍上
+                    from moviepy.video.VideoClip import ColorClip
+                    fallback_clip = ColorClip(size=fallback_size, color=(0, 0, 0),
+                                              duration=target_duration)
+                    video_clips.append(fallback_clip)
         
         # 拼接视频片段
         logger.info("正在拼接视频片段...")
         final_video = concatenate_videoclips(video_clips)
         
-        # 加载音频
+        # 加载音频（有缓存目录时使用共享的解码缓存，不再重新解码）
         logger.info("正在加载音频...")
-        audio_clip = AudioFileClip(self.audio_path)
+        if self.audio_store:
+            audio_clip = self.audio_store.audio_clip(plan.audio_path)
+        else:
+            audio_clip = AudioFileClip(plan.audio_path)
         
         # 确保视频和音频长度匹配
         if final_video.duration > audio_clip.duration:
@@ -274,26 +628,30 @@ class RhythmVideoEditor:
         # 设置音频
         final_video = final_video.set_audio(audio_clip)
         
-        # 导出视频
-        logger.info(f"正在导出视频到: {self.output_path}")
-        final_video.write_videofile(
-            self.output_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True,
-            verbose=False,
-            logger=None
-        )
+        # 导出视频（临时音频文件放在输出文件旁边，避免多个任务同时导出时互相覆盖）
+        fps = min(final_video.fps, PREVIEW_FPS) if preview and final_video.fps else None
+        with self.profiler.stage("encode"):
+            final_video.write_videofile(
+                output_path,
+                fps=fps,
+                codec=profile.video_codec,
+                audio_codec=profile.audio_codec,
+                audio_bitrate=profile.audio_bitrate,
+                preset=profile.preset,
+                threads=profile.threads,
+                ffmpeg_params=profile.x264_params(),
+                temp_audiofile=f"{output_path}.temp-audio.m4a",
+                remove_temp=True,
+                verbose=False,
+                logger=None
+            )
         
         # 清理资源
         final_video.close()
         audio_clip.close()
         for clip in video_clips:
             clip.close()
-        
-        logger.info("视频创建完成！")
-        return self.output_path
+        reader_pool.close()
 
 def main():
     """
@@ -6,7 +6,11 @@
 import os
 import sys
 import argparse
-from rhythm_video_editor import RhythmVideoEditor
+from edit_plan import EditPlan
+from profiler import StageProfiler
+
+# rhythm_video_editor 和 batch 会间接加载较重的依赖，只在真正创建视频时导入，
+# 让 --list、--check 等命令快速启动
 
 def check_files():
     """检查必要文件是否存在"""
@@ -64,8 +68,23 @@ def list_files():
     else:
         print("  🎬 视频文件: video_files 目录不存在")
 
-def create_video(audio_file=None, segment_duration=1.0, output_name="rhythm_video.mp4"):
+def create_video(audio_file=None, segment_duration=1.0, output_name="rhythm_video.mp4", workers=0,
+                 engine="moviepy", render_profile="balanced", threads=None, preview=False,
+                 seed=None, plan_file=None, save_plan=None, short_clip_mode="loop",
+                 profile_path=None, cprofile_stage=None, tempo_mode="static"):
     """创建节奏视频"""
+    from rhythm_video_editor import RhythmVideoEditor
+    
+    # 从剪辑规划渲染时使用规划中记录的音频
+    plan = None
+    if plan_file:
+        try:
+            plan = EditPlan.load(plan_file)
+        except Exception as e:
+            print(f"❌ 读取剪辑规划失败: {e}")
+            return False
+        audio_file = plan.audio_path
+        segment_duration = plan.segment_duration
     
     # 确定音频文件
     if not audio_file:
@@ -91,13 +110,33 @@ def create_video(audio_file=None, segment_duration=1.0, output_name="rhythm_vide
     print(f"🎬 视频目录: video_files")
     print(f"📁 输出文件: {output_path}")
     print(f"⏱️  片段时长: {segment_duration}秒")
+    if plan:
+        print(f"📋 剪辑规划: {plan_file} ({len(plan)}个片段)")
+    print(f"⚙️  分析进程数: {workers if workers > 0 else '全部CPU核心'}")
+    print(f"🎞️  渲染引擎: {engine}")
+    print(f"📼 渲染配置: {'预览 (draft, 低分辨率)' if preview else render_profile}")
+    
+    cprofile_path = os.path.splitext(profile_path or os.path.join("output", "profile.json"))[0] + ".prof"
+    profiler = StageProfiler(cprofile_stage, cprofile_path)
     
     try:
         # 创建编辑器实例
-        editor = RhythmVideoEditor(audio_file, "video_files", output_path)
+        editor = RhythmVideoEditor(audio_file, "video_files", output_path, workers=workers,
+                                   render_profile=render_profile, threads=threads, seed=seed,
+                                   short_clip_mode=short_clip_mode, profiler=profiler,
+                                   tempo_mode=tempo_mode)
+        
+        # 规划片段并保存剪辑规划
+        if plan is None:
+            plan = editor.create_edit_plan(segment_duration)
+            print(f"🎲 随机种子: {plan.seed}")
+            if save_plan:
+                plan.save(save_plan)
+                print(f"📋 剪辑规划已保存: {save_plan}")
         
         # 创建节奏视频
-        result_file = editor.create_rhythm_video(segment_duration=segment_duration)
+        result_file = editor.create_rhythm_video(segment_duration=segment_duration, engine=engine,
+                                                 preview=preview, plan=plan)
         
         print(f"✅ 视频创建成功: {result_file}")
         return True
@@ -105,6 +144,43 @@ def create_video(audio_file=None, segment_duration=1.0, output_name="rhythm_vide
     except Exception as e:
         print(f"❌ 创建视频失败: {e}")
         return False
+    
+    finally:
+        # 失败时也导出已完成阶段的性能报告
+        if profile_path:
+            profiler.log_summary()
+            profiler.save(profile_path)
+            print(f"📊 性能报告已保存: {profile_path}")
+
+def create_batch(manifest_path, jobs=2, workers=0, engine="moviepy", render_profile="balanced"):
+    """按任务清单批量创建节奏视频"""
+    from batch import load_manifest, run_batch
+    
+    try:
+        batch_jobs = load_manifest(manifest_path)
+    except Exception as e:
+        print(f"❌ 读取任务清单失败: {e}")
+        return False
+    
+    print(f"📋 任务清单: {manifest_path} ({len(batch_jobs)}个任务)")
+    print(f"⚙️  并发任务数: {jobs}")
+    
+    try:
+        results = run_batch(batch_jobs, "video_files", concurrency=jobs, workers=workers, engine=engine,
+                            render_profile=render_profile)
+    except Exception as e:
+        print(f"❌ 批量创建失败: {e}")
+        return False
+    
+    print("\n⏱️  任务耗时:")
+    for result in results:
+        status = "✅" if result.success else "❌"
+        line = f"  {status} {result.job.audio} -> {result.job.output}: {result.seconds:.1f}秒"
+        if result.error:
+            line += f" ({result.error})"
+        print(line)
+    
+    return all(result.success for result in results)
 
 def main():
     """主函数"""
@@ -114,6 +190,30 @@ def main():
     parser.add_argument("--duration", type=float, default=1.0, help="视频片段时长（秒）")
     parser.add_argument("--output", type=str, default="rhythm_video.mp4", help="输出文件名")
     parser.add_argument("--check", action="store_true", help="检查环境")
+    parser.add_argument("--workers", type=int, default=0, help="分析视频素材的并行进程数（0表示使用全部CPU核心）")
+    parser.add_argument("--engine", choices=["moviepy", "ffmpeg", "cached", "parallel"], default="moviepy",
+                        help="渲染引擎（cached: 逐片段编码并缓存，修改后只重新编码变化的片段；"
+                             "parallel: 按 --workers 分块并行编码）")
+    parser.add_argument("--preset", choices=["draft", "balanced", "archive"], default="balanced",
+                        help="渲染配置（draft: 快速草稿，balanced: 默认，archive: 高画质存档）")
+    parser.add_argument("--short-clip", choices=["loop", "freeze", "stretch"], default="loop",
+                        help="源片段比节奏间隔短时的补足方式（loop: 循环，freeze: 定格最后一帧，stretch: 放慢速度）")
+    parser.add_argument("--tempo", choices=["static", "dynamic"], default="static",
+                        help="速度模式（static: 全局单一速度，dynamic: 跟踪速度变化，onset 吸附到局部节拍网格）")
+    parser.add_argument("--threads", type=int, default=None, help="编码线程数（默认由ffmpeg自动决定）")
+    parser.add_argument("--preview", action="store_true", help="只生成低分辨率快速预览（文件名加 _preview）")
+    parser.add_argument("--seed", type=int, default=None, help="选择视频片段的随机种子（用于复现剪辑）")
+    parser.add_argument("--save-plan", type=str, help="把剪辑规划保存为JSON文件")
+    parser.add_argument("--plan", type=str, help="从已保存的剪辑规划渲染（跳过音频和视频分析）")
+    parser.add_argument("--profile", type=str, nargs="?", const="output/profile.json",
+                        help="记录各阶段耗时、CPU时间和峰值内存并保存为JSON报告（默认 output/profile.json）")
+    parser.add_argument("--cprofile", type=str, metavar="STAGE",
+                        help="对指定阶段（如 render、audio_analysis）启用 cProfile，统计结果保存为与报告同名的 .prof 文件")
+    parser.add_argument("--batch", type=str, help="批量任务清单（JSON）路径")
+    parser.add_argument("--jobs", type=int, default=2, help="批量模式和服务模式下同时执行的任务数")
+    parser.add_argument("--serve", action="store_true", help="以常驻服务方式运行，通过HTTP接收渲染任务")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="服务模式的监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="服务模式的监听端口")
     
     args = parser.parse_args()
     
@@ -141,8 +241,32 @@ def main():
         list_files()
         return
     
-    # 检查文件
+    # 服务模式
+    if args.serve:
+        from server import serve
+        if not os.path.exists("video_files") or not os.listdir("video_files"):
+            print("❌ video_files 目录中没有视频文件")
+            return
+        print(f"🌐 任务服务: http://{args.host}:{args.port}（并发任务数: {args.jobs}）")
+        serve("video_files", args.host, args.port, concurrency=args.jobs, workers=args.workers)
+        return
+    
+    # 批量模式
+    if args.batch:
+        if not os.path.exists("video_files") or not os.listdir("video_files"):
+            print("❌ video_files 目录中没有视频文件")
+            return
+        print("🚀 开始批量创建节奏视频...")
+        if create_batch(args.batch, args.jobs, args.workers, args.engine, args.preset):
+            print("\n🎉 全部完成！")
+        else:
+            print("\n❌ 部分任务失败，请检查错误信息")
+        return
+    
+    # 检查文件（从剪辑规划渲染时不需要 audio_files 目录）
     issues = check_files()
+    if args.plan:
+        issues = [issue for issue in issues if "audio_files" not in issue]
     if issues:
         print("❌ 发现问题:")
         for issue in issues:
@@ -154,11 +278,12 @@ def main():
     
     # 创建视频
     print("🚀 开始创建节奏视频...")
-    success = create_video(args.audio, args.duration, args.output)
+    success = create_video(args.audio, args.duration, args.output, args.workers, args.engine,
+                           args.preset, args.threads, args.preview, args.seed, args.plan, args.save_plan,
+                           args.short_clip, args.profile, args.cprofile, args.tempo)
     
     if success:
         print("\n🎉 完成！")
-        print(f"📁 输出文件: output/{args.output}")
     else:
         print("\n❌ 创建失败，请检查错误信息")
 
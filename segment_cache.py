@@ -0,0 +1,114 @@
+"""
+片段级渲染缓存
+
+剪辑规划中的每个片段单独编码为一个中间文件，以
+(源文件, 开始时间, 结束时间, 帧数, 分辨率, 帧率, 编码配置, 短片段补足方式) 为键缓存；
+最终输出由 concat 分离器无损拼接这些文件并混入音轨。
+修改规划后重新渲染时，只有发生变化的片段需要重新编码。
+"""
+
+import os
+import hashlib
+import logging
+from typing import List, Sequence, Tuple
+
+from cache_utils import evict_lru
+from ffmpeg_render import RenderSegment, concat_segments, encode_segment, segment_frame_counts
+from render_profile import RenderProfile
+
+logger = logging.getLogger(__name__)
+
+# 片段编码方式变化时递增，使旧的缓存文件失效
+SEGMENT_CACHE_VERSION = 1
+
+
+class SegmentCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        """
+        初始化片段缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限，超出时删除最久未使用的片段
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def segment_key(self, segment: RenderSegment, frame_count: int, size: Tuple[int, int],
+                    fps: float, profile: RenderProfile, short_clip_mode: str = "loop") -> str:
+        """
+        计算片段的缓存键
+
+        源文件按路径、大小和修改时间识别，文件被替换后缓存自然失效。
+        """
+        video_path, start_time, end_time, _ = segment
+        try:
+            stat = os.stat(video_path)
+            source = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        except OSError:
+            source = f"missing|{video_path}"
+
+        parts = [
+            f"v={SEGMENT_CACHE_VERSION}",
+            source,
+            f"{start_time:.6f}",
+            f"{end_time:.6f}",
+            f"frames={frame_count}",
+            f"size={size[0]}x{size[1]}",
+            f"fps={fps:.6f}",
+            repr(tuple(profile._replace(name="", threads=None))),
+            f"short={short_clip_mode}",
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def render(self, segments: Sequence[RenderSegment], audio_path: str, output_path: str,
+               size: Tuple[int, int], fps: float, profile: RenderProfile,
+               short_clip_mode: str = "loop") -> str:
+        """
+        渲染片段列表，已缓存的片段直接复用
+
+        Args:
+            segments: 片段列表，每个元素为 (视频路径, 开始时间, 结束时间, 目标时长)
+            audio_path: 音频文件路径
+            output_path: 输出文件路径
+            size: 输出分辨率 (宽, 高)
+            fps: 输出帧率
+            profile: 编码配置
+            short_clip_mode: 短片段补足方式
+
+        Returns:
+            输出文件路径
+        """
+        if not segments:
+            raise ValueError("没有可渲染的视频片段")
+
+        frame_counts = segment_frame_counts([segment[3] for segment in segments], fps)
+        paths: List[str] = []
+        hits = 0
+
+        for segment, frame_count in zip(segments, frame_counts):
+            key = self.segment_key(segment, int(frame_count), size, fps, profile, short_clip_mode)
+            path = self.path_for(key)
+            if os.path.exists(path):
+                os.utime(path)
+                hits += 1
+            else:
+                # 先写入临时文件再重命名，避免并发任务读到未写完的片段
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                try:
+                    encode_segment(segment, int(frame_count), size, fps, profile, tmp_path,
+                                   short_clip_mode)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            paths.append(path)
+
+        logger.info(f"片段缓存命中 {hits}/{len(segments)}，重新编码 {len(segments) - hits} 个片段")
+        concat_segments(paths, audio_path, output_path, profile)
+        evict_lru(self.cache_dir, ".mp4", self.max_bytes, keep=paths, label="片段缓存")
+        return output_path
@@ -0,0 +1,470 @@
+"""
+渲染任务服务
+
+常驻的本地 HTTP 服务（asyncio + 标准库），素材索引常驻内存并在每个任务前增量刷新，
+节奏分析结果使用磁盘缓存；任务在有上限的进程池中执行，工作进程常驻，
+不必每次重新导入依赖，每个工作进程也保留一份素材信息和节奏分析缓存（含音频内容哈希），
+任务之间只刷新变化的文件。各阶段耗时以换行分隔的 JSON 流实时返回。
+
+接口:
+    POST /jobs                  提交任务 {"audio", "output", "segment_duration", "engine",
+                                "preset", "seed", "short_clip_mode", "tempo_mode", "preview"}
+    GET  /jobs                  任务列表
+    GET  /jobs/<id>             任务状态、事件和结果
+    GET  /jobs/<id>/events      实时事件流（NDJSON，任务结束后关闭）
+    POST /library/refresh       重新扫描素材库
+    GET  /health                服务状态
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from edit_plan import SHORT_CLIP_MODES
+from render_profile import DEFAULT_RENDER_PROFILE, RENDER_PROFILES
+from tempo_tracking import TEMPO_MODES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 等待和执行中的任务数上限，超出时拒绝新任务
+MAX_PENDING_JOBS = 100
+# 保留的已结束任务数
+MAX_FINISHED_JOBS = 1000
+MAX_BODY_BYTES = 1024 * 1024
+
+# 工作进程执行完任务后发出的内部事件：事件队列按顺序传递，收到它时该任务的事件都已到达
+WORKER_DONE_EVENT = "worker_done"
+# 等待该事件的最长时间（秒），工作进程异常退出时不会发出
+WORKER_DONE_TIMEOUT = 5.0
+
+HTTP_STATUS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+# 工作进程中的事件队列，由进程池的 initializer 设置
+_event_queue = None
+
+# 工作进程中常驻的素材库（RhythmVideoEditor），在任务之间保留
+_worker_library = None
+
+
+def _init_worker(queue) -> None:
+    global _event_queue
+    _event_queue = queue
+
+
+def _get_worker_library(video_dir: str, cache_dir: Optional[str]):
+    """工作进程中常驻的素材库，每个任务前增量刷新（服务进程已更新索引，这里只读取变化的文件）"""
+    global _worker_library
+    from rhythm_video_editor import RhythmVideoEditor
+
+    if _worker_library is None or (_worker_library.video_dir, _worker_library.cache_dir) != (video_dir, cache_dir):
+        _worker_library = RhythmVideoEditor("", video_dir, "", cache_dir=cache_dir)
+    _worker_library.load_video_files()
+    return _worker_library
+
+
+def _emit(job_id: str, event: str, **data: Any) -> None:
+    if _event_queue is not None:
+        _event_queue.put({"job": job_id, "event": event, "time": time.time(), **data})
+
+
+def _run_server_job(job_id: str, request: Dict[str, Any], video_dir: str,
+                    cache_dir: Optional[str]) -> Dict[str, Any]:
+    """在工作进程中执行单个任务，阶段结束时通过事件队列上报耗时"""
+    try:
+        return _execute_server_job(job_id, request, video_dir, cache_dir)
+    finally:
+        # 结果经由进程池的管道返回，可能早于事件队列中的 stage 事件到达，服务进程等到该事件后再结束任务
+        _emit(job_id, WORKER_DONE_EVENT)
+
+
+def _execute_server_job(job_id: str, request: Dict[str, Any], video_dir: str,
+                        cache_dir: Optional[str]) -> Dict[str, Any]:
+    from profiler import StageProfiler
+    from rhythm_video_editor import RhythmVideoEditor
+
+    _emit(job_id, "started", pid=os.getpid())
+    profiler = StageProfiler(listener=lambda record: _emit(job_id, "stage", **record))
+
+    output_dir = os.path.dirname(request["output"])
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    editor = RhythmVideoEditor(request["audio"], video_dir, request["output"], cache_dir=cache_dir,
+                               render_profile=request["preset"], seed=request["seed"],
+                               short_clip_mode=request["short_clip_mode"], profiler=profiler,
+                               tempo_mode=request["tempo_mode"])
+    editor.use_library(_get_worker_library(video_dir, cache_dir))
+    plan = editor.create_edit_plan(request["segment_duration"])
+    _emit(job_id, "planned", segments=len(plan), duration=plan.duration, seed=plan.seed)
+
+    output = editor.render_edit_plan(plan, engine=request["engine"], preview=request["preview"])
+    return {"output": output, "seed": plan.seed, "stages": profiler.summary()}
+
+
+class ServerJob:
+    def __init__(self, job_id: str, request: Dict[str, Any]):
+        """
+        服务中的单个任务
+
+        Args:
+            job_id: 任务编号
+            request: 已校验的任务参数
+        """
+        self.id = job_id
+        self.request = request
+        self.status = "queued"
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error = ""
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+        self._updated = asyncio.Event()
+        # 工作进程的全部事件都已到达
+        self.drained = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def add_event(self, event: Dict[str, Any]) -> None:
+        if event["event"] == "started" and self.status == "queued":
+            self.status = "running"
+        self.events.append(event)
+        # 唤醒所有等待新事件的连接，之后的等待者使用新的 Event
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: str = "") -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.add_event({"job": self.id, "event": status, "time": self.finished,
+                        **({"result": result} if result else {}), **({"error": error} if error else {})})
+
+    def update_event(self) -> asyncio.Event:
+        """下一次添加事件时被设置的 Event，须在读取 events 之前获取，才不会漏掉之间添加的事件"""
+        return self._updated
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "audio": self.request["audio"],
+            "output": self.request["output"],
+            "submitted": self.submitted,
+            "finished": self.finished,
+            "error": self.error,
+        }
+
+
+def validate_request(data: Any) -> Dict[str, Any]:
+    """
+    校验并补全任务参数
+
+    Args:
+        data: 请求体解析出的 JSON
+
+    Returns:
+        任务参数
+    """
+    from rhythm_video_editor import RENDER_ENGINES
+
+    if not isinstance(data, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    for key in ("audio", "output"):
+        if not isinstance(data.get(key), str) or not data[key]:
+            raise ValueError(f"缺少 {key}")
+    if not os.path.exists(data["audio"]):
+        raise ValueError(f"音频文件不存在: {data['audio']}")
+
+    request = {
+        "audio": data["audio"],
+        "output": data["output"],
+        "segment_duration": float(data.get("segment_duration", 1.0)),
+        "engine": data.get("engine", "ffmpeg"),
+        "preset": data.get("preset", DEFAULT_RENDER_PROFILE),
+        "seed": data.get("seed"),
+        "short_clip_mode": data.get("short_clip_mode", "loop"),
+        "tempo_mode": data.get("tempo_mode", "static"),
+        "preview": bool(data.get("preview", False)),
+    }
+    if request["segment_duration"] <= 0:
+        raise ValueError("segment_duration 必须大于0")
+    if request["engine"] not in RENDER_ENGINES:
+        raise ValueError(f"未知的渲染引擎: {request['engine']}")
+    if request["preset"] not in RENDER_PROFILES:
+        raise ValueError(f"未知的渲染配置: {request['preset']}")
+    if request["short_clip_mode"] not in SHORT_CLIP_MODES:
+        raise ValueError(f"未知的短片段补足方式: {request['short_clip_mode']}")
+    if request["tempo_mode"] not in TEMPO_MODES:
+        raise ValueError(f"未知的速度模式: {request['tempo_mode']}")
+    if request["seed"] is not None:
+        request["seed"] = int(request["seed"])
+    return request
+
+
+class JobServer:
+    def __init__(self, video_dir: str = "video_files", host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 concurrency: int = 2, cache_dir: Optional[str] = None, workers: int = 0):
+        """
+        初始化任务服务
+
+        Args:
+            video_dir: 视频文件目录
+            host: 监听地址
+            port: 监听端口
+            concurrency: 同时执行的任务数（工作进程数）
+            cache_dir: 缓存目录，None 表示使用默认缓存目录
+            workers: 刷新素材库时分析视频的并行进程数，小于等于0时使用全部CPU核心
+        """
+        from rhythm_video_editor import DEFAULT_CACHE_DIR
+
+        self.video_dir = video_dir
+        self.host = host
+        self.port = port
+        self.concurrency = max(1, concurrency)
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.workers = workers
+        self.jobs: "OrderedDict[str, ServerJob]" = OrderedDict()
+        self.video_count = 0
+        self._library = None
+        self._library_lock: Optional[asyncio.Lock] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue = None
+
+    def _refresh_library(self) -> int:
+        """刷新素材索引（只分析新增或变化的文件），在线程中执行"""
+        from rhythm_video_editor import RhythmVideoEditor
+
+        if self._library is None:
+            self._library = RhythmVideoEditor("", self.video_dir, "", cache_dir=self.cache_dir,
+                                              workers=self.workers)
+        return len(self._library.load_video_files())
+
+    async def refresh_library(self) -> int:
+        async with self._library_lock:
+            loop = asyncio.get_running_loop()
+            self.video_count = await loop.run_in_executor(None, self._refresh_library)
+        return self.video_count
+
+    def _pump_events(self, loop: asyncio.AbstractEventLoop) -> None:
+        """把工作进程的事件转交给事件循环，在后台线程中执行"""
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            loop.call_soon_threadsafe(self._record_event, event)
+
+    def _record_event(self, event: Dict[str, Any]) -> None:
+        job = self.jobs.get(event["job"])
+        if job is None:
+            return
+        if event["event"] == WORKER_DONE_EVENT:
+            job.drained.set()
+        elif not job.done:
+            job.add_event(event)
+
+    def submit(self, request: Dict[str, Any]) -> ServerJob:
+        pending = sum(1 for job in self.jobs.values() if not job.done)
+        if pending >= MAX_PENDING_JOBS:
+            raise OverflowError(f"等待中的任务已达上限 {MAX_PENDING_JOBS}")
+
+        job = ServerJob(uuid.uuid4().hex[:12], request)
+        self.jobs[job.id] = job
+        self._prune_jobs()
+        asyncio.get_running_loop().create_task(self._run(job))
+        logger.info(f"收到任务 {job.id}: {request['audio']} -> {request['output']}")
+        return job
+
+    def _prune_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _run(self, job: ServerJob) -> None:
+        loop = asyncio.get_running_loop()
+        submitted = False
+        try:
+            # 任务开始前增量刷新素材库，工作进程直接从索引读取视频信息
+            await self.refresh_library()
+            submitted = True
+            result = await loop.run_in_executor(self._pool, _run_server_job, job.id, job.request,
+                                                self.video_dir, self.cache_dir)
+            await self._wait_drained(job)
+            job.finish("done", result=result)
+            logger.info(f"任务 {job.id} 完成，耗时 {job.finished - job.submitted:.1f} 秒")
+        except Exception as e:
+            if submitted:
+                await self._wait_drained(job)
+            # 部分异常（如 audioread 的 NoBackendError）没有说明文字，用异常类型代替
+            error = str(e) or type(e).__name__
+            job.finish("failed", error=error)
+            logger.error(f"任务 {job.id} 失败: {error}")
+
+    @staticmethod
+    async def _wait_drained(job: ServerJob) -> None:
+        """等待工作进程的剩余事件到达，再追加最后的 done/failed 事件"""
+        try:
+            await asyncio.wait_for(job.drained.wait(), WORKER_DONE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"任务 {job.id} 的工作进程没有发出结束事件，之后到达的事件将被忽略")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                await self._respond(writer, 413, {"error": "请求体过大"})
+                return
+            body = await reader.readexactly(length) if length else b""
+            await self._route(method.upper(), target.split("?", 1)[0].rstrip("/") or "/", body, writer)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await self._respond(writer, 400, {"error": f"无效的请求: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            await self._respond(writer, 200, {"status": "ok", "videos": self.video_count,
+                                              "concurrency": self.concurrency, "jobs": counts})
+        elif parts == ["library", "refresh"] and method == "POST":
+            await self._respond(writer, 200, {"videos": await self.refresh_library()})
+        elif parts == ["jobs"] and method == "GET":
+            await self._respond(writer, 200, {"jobs": [job.summary() for job in self.jobs.values()]})
+        elif parts == ["jobs"] and method == "POST":
+            try:
+                request = validate_request(json.loads(body.decode("utf-8") or "{}"))
+                job = self.submit(request)
+            except OverflowError as e:
+                await self._respond(writer, 503, {"error": str(e)})
+                return
+            except (ValueError, TypeError) as e:
+                await self._respond(writer, 400, {"error": str(e)})
+                return
+            await self._respond(writer, 202, job.summary())
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                await self._respond(writer, 404, {"error": f"任务不存在: {parts[1]}"})
+            elif len(parts) == 2:
+                await self._respond(writer, 200, {**job.summary(), "events": job.events,
+                                                  "result": job.result})
+            elif parts[2] == "events":
+                await self._stream_events(job, writer)
+            else:
+                await self._respond(writer, 404, {"error": "接口不存在"})
+        elif parts and parts[0] in ("jobs", "library", "health"):
+            await self._respond(writer, 405, {"error": "不支持的请求方法"})
+        else:
+            await self._respond(writer, 404, {"error": "接口不存在"})
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(self._headers(status, [("Content-Type", "application/json; charset=utf-8"),
+                                            ("Content-Length", str(len(body)))]) + body)
+        await writer.drain()
+
+    async def _stream_events(self, job: ServerJob, writer: asyncio.StreamWriter) -> None:
+        """按 chunked 编码逐行发送事件，先补发已有事件，任务结束后关闭"""
+        writer.write(self._headers(200, [("Content-Type", "application/x-ndjson; charset=utf-8"),
+                                         ("Transfer-Encoding", "chunked")]))
+        sent = 0
+
+        def flush() -> None:
+            nonlocal sent
+            while sent < len(job.events):
+                line = json.dumps(job.events[sent], ensure_ascii=False).encode("utf-8") + b"\n"
+                writer.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                sent += 1
+
+        while not job.done:
+            updated = job.update_event()
+            flush()
+            # drain 期间添加的事件会设置 updated，下一轮再发送
+            await writer.drain()
+            if not job.done:
+                await updated.wait()
+        # 任务已结束，补发等待和 drain 期间添加的事件（包括最后的 done/failed）
+        flush()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _headers(status: int, headers: List[Tuple[str, str]]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers + [("Connection", "close")]]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+    async def serve_forever(self) -> None:
+        """启动服务，直到被取消"""
+        loop = asyncio.get_running_loop()
+        self._library_lock = asyncio.Lock()
+        self._queue = multiprocessing.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_worker,
+                                         initargs=(self._queue,))
+        pump = threading.Thread(target=self._pump_events, args=(loop,), daemon=True)
+        pump.start()
+
+        try:
+            logger.info("正在加载视频素材索引...")
+            await self.refresh_library()
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"任务服务已启动: http://{self.host}:{self.port}（{self.video_count} 个视频，"
+                        f"并发任务数 {self.concurrency}）")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._queue.put(None)
+
+
+def serve(video_dir: str = "video_files", host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          concurrency: int = 2, cache_dir: Optional[str] = None, workers: int = 0) -> None:
+    """
+    启动任务服务（阻塞，Ctrl+C 退出）
+
+    Args:
+        video_dir: 视频文件目录
+        host: 监听地址
+        port: 监听端口
+        concurrency: 同时执行的任务数
+        cache_dir: 缓存目录
+        workers: 刷新素材库时分析视频的并行进程数
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = JobServer(video_dir, host, port, concurrency, cache_dir, workers)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("任务服务已停止")
@@ -0,0 +1,148 @@
+"""
+镜头切换检测
+
+在动态分析的同一次顺序解码中，用降采样灰度帧的帧间差异和灰度直方图距离检测硬切，
+得到每个视频的镜头列表；选择片段时只在单个镜头内取材，避免输出片段中间出现源视频自带的切换。
+"""
+
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# 判定为切换的阈值：平均像素差异（0-255）和灰度直方图距离（0-1）同时超过阈值。
+# 只用像素差异会把快速运动误判为切换，只用直方图会漏掉亮度分布相近的切换。
+CUT_DIFF_THRESHOLD = 25.0
+CUT_HIST_THRESHOLD = 0.3
+HIST_BINS = 32
+
+
+def shot_signature() -> str:
+    """镜头检测配置的签名，参数变化时索引中的镜头列表会被重新计算"""
+    return f"cut:{CUT_DIFF_THRESHOLD}:{CUT_HIST_THRESHOLD}:{HIST_BINS}"
+
+
+def _histogram(gray: np.ndarray) -> np.ndarray:
+    shift = 8 - int(np.log2(HIST_BINS))
+    return np.bincount((gray >> shift).ravel(), minlength=HIST_BINS) / gray.size
+
+
+class ShotDetector:
+    def __init__(self, frame_period: float):
+        """
+        初始化镜头检测器
+
+        Args:
+            frame_period: 源视频一帧的时长（秒）
+        """
+        self.frame_period = frame_period
+        self._previous_time: Optional[float] = None
+        self._previous_hist: Optional[np.ndarray] = None
+        # 每次切换记录 (旧镜头最后一帧的结束时间, 新镜头第一个采样帧的时间)
+        self._cuts: List[Tuple[float, float]] = []
+
+    def feed(self, time: float, gray: np.ndarray, diff: Optional[float]) -> None:
+        """
+        输入一个采样帧
+
+        Args:
+            time: 帧时间（秒）
+            gray: 降采样灰度帧
+            diff: 与上一个采样帧的平均像素差异，第一帧为 None
+        """
+        hist = _histogram(gray)
+        if diff is not None and self._previous_hist is not None and diff > CUT_DIFF_THRESHOLD:
+            distance = 0.5 * float(np.abs(hist - self._previous_hist).sum())
+            if distance > CUT_HIST_THRESHOLD:
+                # 切换发生在两个采样帧之间，无法确定具体位置，两侧都保守地排除
+                self._cuts.append((self._previous_time + self.frame_period, time))
+        self._previous_time = time
+        self._previous_hist = hist
+
+    def shots(self, duration: float) -> np.ndarray:
+        """
+        返回镜头列表
+
+        Args:
+            duration: 视频时长
+
+        Returns:
+            形状为 (镜头数, 2) 的数组，每行是一个镜头可安全取材的 (开始时间, 结束时间)
+        """
+        starts = [0.0] + [start for _, start in self._cuts]
+        ends = [end for end, _ in self._cuts] + [duration]
+        return np.asarray(list(zip(starts, ends)), dtype=np.float32).reshape(-1, 2)
+
+
+def shot_end_at(shots: Optional[np.ndarray], time: float, default: float) -> float:
+    """
+    返回包含某个时间点的镜头的结束时间
+
+    Args:
+        shots: 镜头列表，None 表示未知
+        time: 时间点
+        default: 镜头未知或时间点不在任何镜头内时的返回值
+
+    Returns:
+        镜头结束时间
+    """
+    if shots is None or not len(shots):
+        return default
+    index = int(np.searchsorted(shots[:, 0], time + 1e-6, side="right")) - 1
+    if index < 0 or time > shots[index, 1]:
+        return default
+    return min(float(shots[index, 1]), default)
+
+
+def valid_starts(shots: Optional[np.ndarray], start_times: np.ndarray,
+                 segment_duration: float) -> np.ndarray:
+    """
+    判断每个候选开始时间的片段是否完整落在单个镜头内
+
+    Args:
+        shots: 镜头列表，None 表示未知（全部视为有效）
+        start_times: 候选开始时间
+        segment_duration: 片段时长
+
+    Returns:
+        与 start_times 等长的布尔数组
+    """
+    if shots is None or not len(shots):
+        return np.ones(len(start_times), dtype=bool)
+    index = np.searchsorted(shots[:, 0], start_times + 1e-6, side="right") - 1
+    inside = index >= 0
+    ends = shots[np.maximum(index, 0), 1]
+    return inside & (start_times + segment_duration <= ends + 1e-6)
+
+
+def random_shot_start(shots: Optional[np.ndarray], segment_duration: float, video_duration: float,
+                      rng: random.Random) -> float:
+    """
+    随机选择一个落在单个镜头内的开始时间
+
+    能容纳整个片段的镜头按可选范围加权随机；没有这样的镜头时取最长镜头的开头
+    （片段会被镜头截短，渲染时按短片段补足）。只有一个镜头时与不做镜头检测的结果相同。
+
+    Args:
+        shots: 镜头列表，None 表示未知
+        segment_duration: 片段时长
+        video_duration: 视频时长
+        rng: 随机数生成器
+
+    Returns:
+        开始时间
+    """
+    if shots is None or len(shots) <= 1:
+        shot_start = float(shots[0, 0]) if shots is not None and len(shots) else 0.0
+        shot_end = float(shots[0, 1]) if shots is not None and len(shots) else video_duration
+        max_start = max(0.0, min(shot_end, video_duration) - segment_duration)
+        return rng.uniform(shot_start, max_start) if max_start > shot_start else shot_start
+
+    lengths = shots[:, 1] - shots[:, 0]
+    slack = lengths - segment_duration
+    candidates = np.flatnonzero(slack >= 0)
+    if not len(candidates):
+        return float(shots[int(np.argmax(lengths)), 0])
+
+    index = int(rng.choices(candidates.tolist(), weights=(slack[candidates] + 1e-3).tolist())[0])
+    return rng.uniform(float(shots[index, 0]), float(shots[index, 0] + slack[index]))
@@ -0,0 +1,184 @@
+"""
+动态速度跟踪
+
+全局 beat_track 只估计一个速度，速度变化的曲目上节拍网格会逐渐偏离，
+合并进来的 onset 又带来抖动，切换间隔忽长忽短。动态模式逐帧估计局部速度，
+对速度积分得到节拍相位，按局部 onset 能量校正相位后取整数相位处为节拍、
+取 1/SNAP_SUBDIVISIONS 拍处为吸附网格，把 onset 吸附到最近的网格点上，
+再按节拍强度确定小节起点；最小间隔按局部速度缩放。全部计算都是整段包络上的向量运算。
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# 可选的速度模式："static" 为全局单一速度，"dynamic" 为逐帧跟踪速度
+TEMPO_MODES = ("static", "dynamic")
+
+# 每小节拍数
+BEATS_PER_BAR = 4
+
+# onset 吸附网格的每拍细分数（2 表示八分音符）
+SNAP_SUBDIVISIONS = 2
+
+# 最小间隔以该速度下的秒数给出，其他速度按比例缩放（0.3 秒在 120 BPM 下约为 0.6 拍）
+REFERENCE_BPM = 120.0
+
+# 估计局部速度和节拍相位时使用的窗口（秒）
+TEMPO_WINDOW = 8.0
+SMOOTH_WINDOW = 4.0
+
+# 分块计算速度图时每块的帧数，限制长音频的内存占用
+TEMPO_BLOCK_FRAMES = 8192
+
+
+class TempoTrack(NamedTuple):
+    """动态速度跟踪结果"""
+    beat_times: np.ndarray      # 节拍时间
+    onset_times: np.ndarray     # 吸附到网格后的 onset 时间
+    downbeat_times: np.ndarray  # 小节起点时间
+    curve_times: np.ndarray     # 速度曲线的时间点
+    curve_bpm: np.ndarray       # 每个时间点的局部速度
+
+    def bpm_at(self, times: np.ndarray) -> np.ndarray:
+        """给定时间点的局部速度"""
+        return np.interp(times, self.curve_times, self.curve_bpm)
+
+    def min_gaps(self, times: np.ndarray, min_gap: float) -> np.ndarray:
+        """
+        按局部速度缩放的最小间隔
+
+        Args:
+            times: 时间点
+            min_gap: REFERENCE_BPM 下的最小间隔（秒）
+
+        Returns:
+            与 times 等长的最小间隔数组
+        """
+        return min_gap * REFERENCE_BPM / self.bpm_at(times)
+
+
+def local_tempo(envelope: np.ndarray, sr: int, hop_length: int) -> np.ndarray:
+    """
+    逐帧估计局部速度
+
+    librosa.feature.tempo(aggregate=None) 会一次生成整段的速度图（每帧数百个延迟），
+    这里按块计算，块之间重叠一个窗口，结果与整段计算相同。
+
+    Args:
+        envelope: onset 强度包络
+        sr: 采样率
+        hop_length: 包络步长
+
+    Returns:
+        每帧的速度（BPM）
+    """
+    import librosa
+    from scipy.ndimage import median_filter
+
+    n = len(envelope)
+    frame_rate = sr / hop_length
+    pad = int(np.ceil(TEMPO_WINDOW * frame_rate))
+    bpm = np.empty(n, dtype=np.float64)
+    for start in range(0, n, TEMPO_BLOCK_FRAMES):
+        stop = min(n, start + TEMPO_BLOCK_FRAMES)
+        lo, hi = max(0, start - pad), min(n, stop + pad)
+        block = librosa.feature.tempo(onset_envelope=np.asarray(envelope[lo:hi]), sr=sr,
+                                      hop_length=hop_length, ac_size=TEMPO_WINDOW, aggregate=None)
+        bpm[start:stop] = block[start - lo:stop - lo]
+
+    # 静音段估计不出速度，用整体中位数代替；再在对数域做中值滤波，去掉逐帧的跳变
+    valid = bpm > 0
+    bpm[~valid] = np.median(bpm[valid]) if valid.any() else REFERENCE_BPM
+    size = max(1, int(SMOOTH_WINDOW * frame_rate)) | 1
+    return np.exp(median_filter(np.log(bpm), size=size, mode="nearest"))
+
+
+def _phase_crossings(times: np.ndarray, phase: np.ndarray) -> np.ndarray:
+    """相位经过整数值的时间点（在相邻帧之间线性插值）"""
+    whole = np.floor(phase)
+    index = np.flatnonzero(whole[1:] > whole[:-1])
+    fraction = (whole[index + 1] - phase[index]) / (phase[index + 1] - phase[index])
+    return times[index] + fraction * (times[index + 1] - times[index])
+
+
+def snap_to_grid(times: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    把时间点吸附到最近的网格点，去重排序后返回
+
+    Args:
+        times: 时间点
+        grid: 已排序的网格
+
+    Returns:
+        吸附后的时间点
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(grid) < 2 or not len(times):
+        return times
+    right = np.clip(np.searchsorted(grid, times), 1, len(grid) - 1)
+    left = right - 1
+    nearest = np.where(times - grid[left] <= grid[right] - times, left, right)
+    return np.unique(grid[nearest])
+
+
+def track_tempo(beat_envelope: np.ndarray, onset_times: np.ndarray, sr: int,
+                hop_length: int) -> TempoTrack:
+    """
+    跟踪速度变化，生成节拍、小节起点，并把 onset 吸附到局部网格
+
+    Args:
+        beat_envelope: 用于节拍跟踪的 onset 强度包络
+        onset_times: 检测到的 onset 时间
+        sr: 采样率
+        hop_length: 包络步长
+
+    Returns:
+        动态速度跟踪结果
+    """
+    from scipy.signal import fftconvolve
+
+    envelope = np.asarray(beat_envelope, dtype=np.float64)
+    frame_period = hop_length / sr
+    times = np.arange(len(envelope)) * frame_period
+    bpm = local_tempo(envelope, sr, hop_length)
+
+    if len(envelope) < 2:
+        empty = np.zeros(0)
+        return TempoTrack(empty, np.asarray(onset_times, dtype=np.float64), empty, times, bpm)
+
+    # 对速度积分得到已经过的拍数，再用窗口内 onset 能量的相位校正：
+    # 能量集中在相位为 φ 的位置时，Σ e·exp(2πi·相位) 的辐角就是 2πφ
+    phase = np.concatenate([[0.0], np.cumsum(bpm[:-1] / 60.0 * frame_period)])
+    window = np.hanning(max(3, int(TEMPO_WINDOW / frame_period)))
+    local = fftconvolve(envelope * np.exp(2j * np.pi * phase), window, mode="same")
+    offset = np.unwrap(np.angle(local)) / (2 * np.pi)
+    # 校正量变化时相位不能倒退，否则会产生重复的节拍
+    beat_phase = np.maximum.accumulate(phase - offset)
+    beat_phase -= np.floor(beat_phase[0])
+
+    beat_times = _phase_crossings(times, beat_phase)
+    grid = _phase_crossings(times, beat_phase * SNAP_SUBDIVISIONS)
+    snapped = snap_to_grid(onset_times, grid)
+
+    # 与 beat_track(trim=True) 相同，去掉开头和结尾的弱拍（静音的前奏、尾声和流式分析补齐的部分）
+    smoothed = np.convolve(envelope, np.hanning(5), mode="same")
+    strength = smoothed[np.minimum(np.round(beat_times / frame_period).astype(int), len(envelope) - 1)]
+    # 数字静音时 strength 全为0，必须严格大于阈值且阈值大于0，否则不会去掉任何一拍
+    rms = np.sqrt(np.mean(strength ** 2)) if len(strength) else 0.0
+    strong = np.flatnonzero(strength > 0.5 * rms) if rms > 0 else np.zeros(0, dtype=int)
+    if len(strong):
+        beat_times = beat_times[strong[0]:strong[-1] + 1]
+        strength = strength[strong[0]:strong[-1] + 1]
+    else:
+        beat_times = strength = np.zeros(0)
+
+    # 小节起点：拍号固定为 BEATS_PER_BAR，取节拍强度之和最大的位置作为每小节第一拍
+    if len(beat_times):
+        padded = np.pad(strength, (0, -len(strength) % BEATS_PER_BAR))
+        first = int(np.argmax(padded.reshape(-1, BEATS_PER_BAR).sum(axis=0)))
+        downbeat_times = beat_times[first::BEATS_PER_BAR]
+    else:
+        downbeat_times = beat_times
+
+    return TempoTrack(beat_times, snapped, downbeat_times, times, bpm)
@@ -0,0 +1,50 @@
+"""
+节奏点网格测试：倍增跳转的最小间隔过滤与逐点循环的结果一致
+"""
+
+import numpy as np
+import pytest
+
+from beat_grid import BeatGrid, min_gap_filter
+
+
+def loop_filter(times, min_gap):
+    """逐点比较的参考实现（与原来的 Python 循环相同）"""
+    gaps = np.broadcast_to(np.asarray(min_gap, dtype=np.float64), np.shape(times))
+    kept = []
+    last_gap = None
+    for t, gap in zip(times, gaps):
+        if not kept or t - kept[-1] >= last_gap:
+            kept.append(t)
+            last_gap = gap
+    return np.array(kept)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_loop_with_scalar_gap(seed):
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, 30, rng.integers(1, 300)))
+    min_gap = rng.uniform(0.01, 1.0)
+    np.testing.assert_array_equal(min_gap_filter(times, min_gap), loop_filter(times, min_gap))
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_loop_with_per_point_gaps(seed):
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, 30, rng.integers(1, 300)))
+    gaps = rng.uniform(0.05, 1.0, len(times))
+    np.testing.assert_array_equal(min_gap_filter(times, gaps), loop_filter(times, gaps))
+
+
+def test_edge_cases():
+    assert len(min_gap_filter(np.array([]), 0.3)) == 0
+    np.testing.assert_array_equal(min_gap_filter(np.array([1.0]), 0.3), [1.0])
+    # 间隔恰好等于 min_gap 的点保留
+    np.testing.assert_array_equal(min_gap_filter(np.array([0.0, 0.3, 0.6]), 0.3), [0.0, 0.3, 0.6])
+    np.testing.assert_array_equal(min_gap_filter(np.zeros(5), 0.3), [0.0])
+
+
+def test_from_events_merges_and_dedups():
+    grid = BeatGrid.from_events(np.array([0.0, 1.0, 2.0]), np.array([1.0, 1.1, 3.0]), min_gap=0.3)
+    np.testing.assert_array_equal(grid.times, [0.0, 1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(grid.intervals, [1.0, 1.0, 1.0])
@@ -0,0 +1,91 @@
+"""
+片段分配测试：树状数组版本与逐个视频比较代价的暴力实现一致，并满足相邻不重复等约束
+"""
+
+import numpy as np
+import pytest
+
+from clip_assignment import MAX_CLIP_USES, REUSE_PENALTY, _PositionSet, assign_clips, quantiles
+
+
+def brute_force_assign(beat_energy, clip_motion, max_uses=MAX_CLIP_USES, reuse_penalty=REUSE_PENALTY):
+    """与 assign_clips 规则相同、每个节奏点遍历全部视频的参考实现"""
+    clip_count = len(clip_motion)
+    order = np.argsort(np.asarray(clip_motion, dtype=np.float64), kind="stable")
+    motion_q = (np.arange(clip_count) + 0.5) / clip_count
+    usage = [0] * clip_count
+    previous = -1
+    result = []
+
+    def search(quantile):
+        best_cost, best = None, -1
+        for uses in range(max_uses):
+            for position in range(clip_count):
+                if usage[position] != uses or position == previous:
+                    continue
+                cost = abs(motion_q[position] - quantile) + reuse_penalty * uses
+                if best_cost is None or cost < best_cost:
+                    best_cost, best = cost, position
+        return best
+
+    for quantile in quantiles(beat_energy):
+        if all(uses >= max_uses for uses in usage):
+            usage = [0] * clip_count
+        best = search(quantile)
+        if best < 0 and clip_count > 1:
+            usage = [0] * clip_count
+            best = search(quantile)
+        if best < 0:
+            best = previous
+        usage[best] += 1
+        result.append(order[best])
+        previous = best
+    return np.array(result)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    clip_count = int(rng.integers(1, 40))
+    # 节奏点数为视频数的整数倍时分位数会出现等距的情况，同时覆盖并列代价
+    beats = int(rng.choice([rng.integers(1, 200), clip_count * int(rng.integers(1, 5))]))
+    energy = rng.random(beats)
+    motion = rng.random(clip_count)
+    max_uses = int(rng.integers(1, 4))
+    np.testing.assert_array_equal(assign_clips(energy, motion, max_uses=max_uses),
+                                  brute_force_assign(energy, motion, max_uses=max_uses))
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_no_adjacent_repeats(seed):
+    rng = np.random.default_rng(seed)
+    clip_count = int(rng.integers(2, 6))
+    result = assign_clips(rng.random(int(rng.integers(1, 80))), rng.random(clip_count),
+                          max_uses=int(rng.integers(1, 4)))
+    assert np.all(result[1:] != result[:-1])
+    assert result.min() >= 0 and result.max() < clip_count
+
+
+def test_energy_ranks_match_motion_ranks():
+    # 节奏点数与视频数相同时，每个节奏点都恰好分到分位数相同的视频
+    rng = np.random.default_rng(0)
+    energy, motion = rng.random(20), rng.random(20)
+    result = assign_clips(energy, motion)
+    np.testing.assert_array_equal(np.argsort(np.argsort(motion))[result], np.argsort(np.argsort(energy)))
+
+
+def test_single_clip_and_empty():
+    np.testing.assert_array_equal(assign_clips(np.arange(5.0), np.array([0.3])), [0] * 5)
+    assert len(assign_clips(np.array([]), np.array([0.1, 0.2]))) == 0
+    with pytest.raises(ValueError):
+        assign_clips(np.arange(3.0), np.array([]))
+
+
+def test_position_set_select_and_rank():
+    positions = _PositionSet(10, full=True)
+    positions.add(3, -1)
+    positions.add(7, -1)
+    assert positions.count == 8
+    assert [positions.select(k) for k in range(positions.count)] == [0, 1, 2, 4, 5, 6, 8, 9]
+    assert positions.rank(5) == 4
+    assert positions.around(5) == [2, 4, 5, 6]
@@ -0,0 +1,45 @@
+"""
+剪辑规划测试：JSON 序列化往返不丢失信息
+"""
+
+import json
+
+import pytest
+
+from edit_plan import PLAN_FORMAT_VERSION, EditPlan, PlannedSegment
+
+
+def make_plan(seed=42):
+    segments = [("video_files/a.mp4", 0.0, 0.5, 0.5),
+                ("video_files/视频 b.mp4", 1.25, 1.75, 0.4999999999999999),
+                ("video_files/a.mp4", 3.0, 3.2, 0.8)]
+    return EditPlan("audio_files/song.mp3", segments, 1.0, seed=seed)
+
+
+@pytest.mark.parametrize("seed", [42, None])
+def test_dict_round_trip(seed):
+    plan = make_plan(seed)
+    restored = EditPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert restored.audio_path == plan.audio_path
+    assert restored.segment_duration == plan.segment_duration
+    assert restored.seed == plan.seed
+    # 浮点数经 JSON 往返后完全相同，渲染时的帧数不会变化
+    assert restored.segments == plan.segments
+    assert all(isinstance(segment, PlannedSegment) for segment in restored.segments)
+    assert restored.duration == plan.duration
+
+
+def test_file_round_trip(tmp_path):
+    plan = make_plan()
+    path = tmp_path / "plan.json"
+    plan.save(str(path))
+    restored = EditPlan.load(str(path))
+    assert restored.to_dict() == plan.to_dict()
+    assert len(restored) == 3
+
+
+def test_rejects_unknown_version():
+    data = make_plan().to_dict()
+    data["version"] = PLAN_FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        EditPlan.from_dict(data)
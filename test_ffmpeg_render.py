@@ -0,0 +1,38 @@
+"""
+ffmpeg 渲染引擎测试：分块覆盖全部片段且每块不超过输入数上限，帧数累计不漂移
+"""
+
+import numpy as np
+import pytest
+
+from ffmpeg_render import MAX_CHUNK_INPUTS, segment_frame_counts, split_chunks
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_split_chunks_bounds(seed):
+    rng = np.random.default_rng(seed)
+    frame_counts = rng.integers(1, 60, int(rng.integers(1, 700)))
+    chunk_count = int(rng.integers(1, 17))
+    max_inputs = int(rng.integers(1, 2 * MAX_CHUNK_INPUTS))
+    chunks = split_chunks(frame_counts, chunk_count, max_inputs)
+
+    # 连续、不重叠、覆盖全部片段
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(frame_counts)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+    assert all(0 < end - start <= max_inputs for start, end in chunks)
+    # 至少有 chunk_count 个区块（片段数足够时），供所有工作进程使用
+    assert len(chunks) >= min(chunk_count, len(frame_counts))
+
+
+def test_split_chunks_default_cap():
+    chunks = split_chunks(np.full(119, 12), 2)
+    assert max(end - start for start, end in chunks) <= MAX_CHUNK_INPUTS
+    assert len(split_chunks(np.full(3, 12), 1)) == 1
+
+
+def test_segment_frame_counts_follow_timeline():
+    durations = np.full(1000, 0.37)
+    counts = segment_frame_counts(durations, 30)
+    # 按累计时长取整，总帧数与整条时间轴一致，不会逐段累积误差
+    assert counts.sum() == round(durations.sum() * 30)
+    assert set(counts.tolist()) <= {11, 12}
@@ -0,0 +1,183 @@
+"""
+视频素材索引
+
+用 SQLite 持久化每个视频文件的时长、帧率、分辨率、帧数、动态分数和动态曲线，
+以 (路径, 文件大小, 修改时间) 判断文件是否变化，只对新增或改动的文件重新分析。
+"""
+
+import os
+import sqlite3
+import logging
+from contextlib import closing
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 表结构变化时递增，旧版本的索引会被重建
+SCHEMA_VERSION = 4
+
+
+class VideoInfo(NamedTuple):
+    """单个视频文件的元数据、动态分数、动态曲线和镜头列表"""
+    path: str
+    duration: float
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+    motion_score: float
+    score_time: float = 0.0
+    motion_profile: Optional[np.ndarray] = None
+    shots: Optional[np.ndarray] = None  # (镜头数, 2) 的 (开始时间, 结束时间)，None 表示未检测
+
+
+def probe_video(video_path: str) -> Tuple[float, float, int, int, int]:
+    """
+    读取视频流信息
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        (时长, 帧率, 宽, 高, 帧数)，无法打开时全部为 0
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return 0.0, 0.0, 0, 0, 0
+
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        duration = frame_count / fps if fps > 0 else 0.0
+        return duration, fps, width, height, frame_count
+    finally:
+        cap.release()
+
+
+class VideoIndex:
+    def __init__(self, db_path: str, signature: str = ""):
+        """
+        初始化视频索引
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            signature: 动态分析配置签名，与记录中的签名不一致的文件会被重新分析
+        """
+        self.db_path = db_path
+        self.signature = signature
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS videos")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS videos (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    fps REAL NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    frame_count INTEGER NOT NULL,
+                    motion_score REAL NOT NULL,
+                    score_time REAL NOT NULL,
+                    motion_profile BLOB,
+                    shots BLOB,
+                    signature TEXT NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def _file_key(path: str) -> Tuple[str, int, float]:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime
+
+    def stale_files(self, video_paths: Iterable[str]) -> List[str]:
+        """
+        找出需要重新分析的视频（新文件、大小/修改时间发生变化或分析配置不同的文件）
+
+        Args:
+            video_paths: 视频文件路径列表
+
+        Returns:
+            需要重新分析的视频路径列表
+        """
+        stale = []
+        with closing(self._connect()) as conn:
+            for path in video_paths:
+                key, size, mtime = self._file_key(path)
+                row = conn.execute(
+                    "SELECT size, mtime, signature FROM videos WHERE path = ?", (key,)
+                ).fetchone()
+                if row is None or row != (size, mtime, self.signature):
+                    stale.append(path)
+        return stale
+
+    def update(self, infos: Iterable[VideoInfo]) -> None:
+        """
+        写入（或覆盖）视频信息
+
+        Args:
+            infos: 视频信息列表
+        """
+        rows = []
+        for info in infos:
+            key, size, mtime = self._file_key(info.path)
+            profile = None
+            if info.motion_profile is not None:
+                profile = np.asarray(info.motion_profile, dtype=np.float32).tobytes()
+            shots = None
+            if info.shots is not None:
+                shots = np.asarray(info.shots, dtype=np.float32).tobytes()
+            rows.append((key, size, mtime, info.duration, info.fps, info.width,
+                         info.height, info.frame_count, info.motion_score,
+                         info.score_time, profile, shots, self.signature))
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO videos "
+                "(path, size, mtime, duration, fps, width, height, frame_count, motion_score, "
+                "score_time, motion_profile, shots, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_many(self, video_paths: Iterable[str]) -> Dict[str, VideoInfo]:
+        """
+        读取视频信息
+
+        Args:
+            video_paths: 视频文件路径列表
+
+        Returns:
+            路径 -> 视频信息，索引中不存在的文件不会出现在结果中
+        """
+        result = {}
+        with closing(self._connect()) as conn:
+            for path in video_paths:
+                row = conn.execute(
+                    "SELECT duration, fps, width, height, frame_count, motion_score, score_time, "
+                    "motion_profile, shots FROM videos WHERE path = ?",
+                    (os.path.abspath(path),),
+                ).fetchone()
+                if row is not None:
+                    profile = np.frombuffer(row[-2], dtype=np.float32) if row[-2] is not None else None
+                    shots = None
+                    if row[-1] is not None:
+                        shots = np.frombuffer(row[-1], dtype=np.float32).reshape(-1, 2)
+                    result[path] = VideoInfo(path, *row[:-2], profile, shots)
+        return result